@@ -0,0 +1,517 @@
+"""Benchmark and load generator for the OCR pipeline.
+
+Generates synthetic documents (noisy/skewed text images, multi-page PDFs, DOCX)
+and measures them against one of three targets:
+
+* ``stages``: each pipeline stage called in isolation (convert, render,
+  preprocess, tesseract, paddle, persist), with latency and peak RSS per stage
+* ``inprocess``: ``OcrService.process`` at the given concurrency
+* ``http``: ``POST /ocr`` on a running server at the given concurrency
+
+Reports are JSON so runs can be diffed across commits::
+
+    python benchmark.py --target stages --docs 10 --pages 3 --output stages.json
+    python benchmark.py --target http --url http://localhost:8000 --concurrency 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib import request as urlrequest
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "invoice total amount date customer address payment number account bank transfer "
+    "order quantity price tax receipt station report document contract signature office "
+    "street district city province company limited phone email reference balance due"
+).split()
+
+STAGES = ("convert", "render", "decode", "preprocess", "tesseract", "paddle", "persist")
+
+
+def _rss_bytes() -> int:
+    """Resident memory of this process and its children (Linux /proc), 0 when unavailable."""
+    total = 0
+    pids = [os.getpid()]
+    try:
+        for task in Path(f"/proc/{os.getpid()}/task").iterdir():
+            children = (task / "children").read_text().split()
+            pids.extend(int(pid) for pid in children)
+    except OSError:
+        pass
+    for pid in pids:
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+                    break
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """Track the peak RSS observed while the sampler is running."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> RssSampler:
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@dataclass
+class StageStats:
+    latencies: list[float] = field(default_factory=list)
+    pages: int = 0
+    peak_rss: int = 0
+    errors: int = 0
+
+    def record(self, seconds: float, pages: int, peak_rss: int) -> None:
+        self.latencies.append(seconds)
+        self.pages += pages
+        self.peak_rss = max(self.peak_rss, peak_rss)
+
+    def report(self, wall_seconds: Optional[float] = None) -> dict:
+        busy = sum(self.latencies)
+        elapsed = wall_seconds if wall_seconds is not None else busy
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "count": len(self.latencies),
+            "errors": self.errors,
+            "pages": self.pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(self.pages / elapsed, 3) if elapsed else None,
+            "p50_ms": ms(_percentile(self.latencies, 0.50)),
+            "p95_ms": ms(_percentile(self.latencies, 0.95)),
+            "p99_ms": ms(_percentile(self.latencies, 0.99)),
+            "max_ms": ms(max(self.latencies) if self.latencies else None),
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+        }
+
+
+@contextmanager
+def _measure(stats: StageStats, pages: int = 1) -> Iterator[None]:
+    started = time.perf_counter()
+    with RssSampler() as sampler:
+        try:
+            yield
+        except Exception:
+            stats.errors += 1
+            raise
+    stats.record(time.perf_counter() - started, pages, sampler.peak)
+
+
+@dataclass
+class SyntheticDocument:
+    """A generated input file (image, PDF or DOCX) and its page count."""
+
+    path: Path
+    kind: str
+    pages: int
+
+
+def _random_lines(rng: random.Random, count: int) -> list[str]:
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 9))) for _ in range(count)]
+
+
+def render_text_image(lines: list[str], rng: random.Random, noise_sigma: float, skew_deg: float):
+    """Render text on a white A4 page at ~150 DPI, then rotate and add Gaussian noise."""
+    import cv2
+    import numpy as np
+
+    height, width = 1754, 1240
+    image = np.full((height, width), 255, dtype=np.uint8)
+    y = 120
+    for line in lines:
+        cv2.putText(image, line, (90, y), cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2, cv2.LINE_AA)
+        y += 56
+        if y > height - 100:
+            break
+    if skew_deg:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew_deg, 1.0)
+        image = cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+    if noise_sigma:
+        noise = np.random.default_rng(rng.randint(0, 2**31)).normal(0, noise_sigma, image.shape)
+        image = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def _write_pdf(images: list, path: Path) -> None:
+    from PIL import Image
+
+    pages = [Image.fromarray(image[:, :, ::-1]) for image in images]
+    pages[0].save(path, "PDF", resolution=150.0, save_all=True, append_images=pages[1:])
+
+
+def _write_docx(paragraphs: list[str], path: Path) -> None:
+    """Minimal WordprocessingML package: enough for LibreOffice and the native text reader."""
+    body = "".join(f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>" for text in paragraphs)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+
+
+def generate_documents(
+    output_dir: Path,
+    count: int,
+    kinds: list[str],
+    pages: int,
+    noise_sigma: float,
+    max_skew: float,
+    seed: int,
+) -> list[SyntheticDocument]:
+    import cv2
+
+    rng = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    documents: list[SyntheticDocument] = []
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        if kind == "image":
+            path = output_dir / f"doc_{index:04d}.png"
+            image = render_text_image(_random_lines(rng, 24), rng, noise_sigma, rng.uniform(-max_skew, max_skew))
+            cv2.imwrite(str(path), image)
+            documents.append(SyntheticDocument(path, kind, 1))
+        elif kind == "pdf":
+            path = output_dir / f"doc_{index:04d}.pdf"
+            images = [
+                render_text_image(_random_lines(rng, 24), rng, noise_sigma, rng.uniform(-max_skew, max_skew))
+                for _ in range(pages)
+            ]
+            _write_pdf(images, path)
+            documents.append(SyntheticDocument(path, kind, pages))
+        elif kind == "docx":
+            path = output_dir / f"doc_{index:04d}.docx"
+            _write_docx(_random_lines(rng, 40 * pages), path)
+            documents.append(SyntheticDocument(path, kind, pages))
+        else:
+            raise ValueError(f"Unknown document kind: {kind}")
+    return documents
+
+
+def bench_stages(documents: list[SyntheticDocument], mode: str) -> dict:
+    """Run every stage separately and sequentially so latency and peak RSS are attributable."""
+    from pdf2image import pdfinfo_from_path
+
+    from ocr_service.converter import CONVERTER_POOL
+    from ocr_service.database import OcrRun, session_scope
+    from ocr_service.document_processor import DOCUMENT_PROCESSOR, PreparedDocument
+    from ocr_service.engines import PADDLE_ENGINE, TESSERACT_ENGINE
+    from ocr_service.preprocess import PREPROCESSOR
+    from ocr_service.service import SERVICE
+    from ocr_service.storage import STORAGE
+
+    stats = {stage: StageStats() for stage in STAGES}
+    engines = {"fast": ("tesseract",), "enhanced": ("paddle",)}.get(mode, ("tesseract", "paddle"))
+    if "paddle" in engines:
+        PADDLE_ENGINE.preload()
+    CONVERTER_POOL.start()
+
+    started = time.perf_counter()
+    for document in documents:
+        run_id = SERVICE.create_run(document.path, document.path.name, mode=mode, status="processing")
+        with session_scope() as session:
+            created_at = session.get(OcrRun, run_id).created_at
+        run_dirs = STORAGE.prepare_run_directory(run_id, created_at)
+        pdf_path: Optional[Path] = None
+        if document.kind == "docx":
+            with _measure(stats["convert"], document.pages):
+                pdf_path = CONVERTER_POOL.convert(document.path)
+        elif document.kind == "pdf":
+            pdf_path = document.path
+
+        if pdf_path is not None:
+            page_count = int(pdfinfo_from_path(str(pdf_path))["Pages"])
+            with _measure(stats["render"], page_count):
+                page_images = list(
+                    DOCUMENT_PROCESSOR._iter_pdf_pages(pdf_path, run_dirs["uploads"], list(range(1, page_count + 1)))
+                )
+        else:
+            # Decoding includes the resolution policy's downscale of oversized photos
+            with _measure(stats["decode"]):
+                page_images = [DOCUMENT_PROCESSOR._load_image(document.path)]
+
+        preprocessed = []
+        results = []
+        for page in page_images:
+            with _measure(stats["preprocess"]):
+                pre = PREPROCESSOR.enhance(page)
+            preprocessed.append(pre)
+            if "tesseract" in engines:
+                with _measure(stats["tesseract"]):
+                    results.append(TESSERACT_ENGINE.run(pre.image, page_number=page.page_number))
+            if "paddle" in engines:
+                with _measure(stats["paddle"]):
+                    results.append(PADDLE_ENGINE.run(pre.image, page_number=page.page_number))
+
+        prepared = PreparedDocument(
+            original_path=document.path,
+            mime_type=None,
+            pages=iter(()),
+            converted_files=[],
+            page_count=len(page_images),
+            page_images=page_images,
+            preprocessed=preprocessed,
+        )
+        with _measure(stats["persist"], len(page_images)):
+            SERVICE._persist_results(run_id, mode, prepared, results, results[0].engine if results else "none")
+    wall = time.perf_counter() - started
+    report = {stage: stage_stats.report() for stage, stage_stats in stats.items() if stage_stats.latencies}
+    report["total"] = {"seconds": round(wall, 3), "documents": len(documents)}
+    return report
+
+
+def _run_concurrently(documents: list[SyntheticDocument], concurrency: int, submit) -> dict:
+    stats = StageStats()
+    lock = threading.Lock()
+
+    def one(document: SyntheticDocument) -> None:
+        started = time.perf_counter()
+        try:
+            submit(document)
+        except Exception as exc:  # noqa: BLE001
+            print(f"{document.path.name}: {exc}", file=sys.stderr)
+            with lock:
+                stats.errors += 1
+            return
+        with lock:
+            stats.record(time.perf_counter() - started, document.pages, 0)
+
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, documents))
+        wall = time.perf_counter() - started
+    stats.peak_rss = sampler.peak
+    return {"document": stats.report(wall_seconds=wall), "concurrency": concurrency}
+
+
+def bench_inprocess(documents: list[SyntheticDocument], mode: str, concurrency: int) -> dict:
+    from ocr_service.parallel import PAGE_POOL
+    from ocr_service.service import SERVICE
+    from ocr_service.warmup import WARMUP
+
+    # Same startup path as the API so model loading is not part of the first request
+    WARMUP.start()
+    while WARMUP.state == "starting":
+        time.sleep(0.1)
+    if not WARMUP.ready:
+        raise RuntimeError(f"Warmup failed: {WARMUP.error}")
+    # Per-run stage timings recorded by the service (summary["timings"]), summed per document
+    stages: dict[str, StageStats] = {}
+    lock = threading.Lock()
+
+    def submit(document: SyntheticDocument) -> None:
+        result = SERVICE.process(document.path, document.path.name, mode)
+        with lock:
+            for stage, timing in result.summary.get("timings", {}).items():
+                stages.setdefault(stage, StageStats()).record(timing["ms"] / 1000, 0, 0)
+
+    try:
+        report = _run_concurrently(documents, concurrency, submit)
+    finally:
+        PAGE_POOL.shutdown()
+    report["stages"] = {stage: stats.report() for stage, stats in sorted(stages.items())}
+    return report
+
+
+def _post_multipart(url: str, document: SyntheticDocument, mode: str, timeout: float) -> dict:
+    boundary = uuid.uuid4().hex
+    body = b"".join(
+        [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="mode"\r\n\r\n{mode}\r\n'.encode(),
+            (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{document.path.name}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+            ).encode(),
+            document.path.read_bytes(),
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    req = urlrequest.Request(
+        f"{url.rstrip('/')}/ocr",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST",
+    )
+    with urlrequest.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def bench_http(
+    documents: list[SyntheticDocument],
+    mode: str,
+    concurrency: int,
+    url: str,
+    timeout: float,
+) -> dict:
+    # RSS here is the load generator's own; the server's memory is reported by the server side
+    return _run_concurrently(
+        documents,
+        concurrency,
+        lambda document: _post_multipart(url, document, mode, timeout),
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.decode().strip() or None
+
+
+def _config_snapshot() -> dict:
+    from ocr_service.config import CONFIG
+
+    return json.loads(json.dumps(asdict(CONFIG), default=str))
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("stages", "inprocess", "http"), default="stages")
+    parser.add_argument("--mode", choices=("auto", "fast", "enhanced", "cascade"), default="auto")
+    parser.add_argument("--docs", type=int, default=10, help="number of synthetic documents")
+    parser.add_argument("--kinds", default="image,pdf,docx", help="comma-separated: image, pdf, docx")
+    parser.add_argument("--pages", type=int, default=3, help="pages per PDF/DOCX document")
+    parser.add_argument("--noise", type=float, default=6.0, help="Gaussian noise sigma")
+    parser.add_argument("--skew", type=float, default=2.0, help="maximum skew in degrees")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--timeout", type=float, default=600.0, help="HTTP timeout per request")
+    parser.add_argument("--workdir", type=Path, help="keep documents and benchmark storage here")
+    parser.add_argument(
+        "--use-configured-storage",
+        action="store_true",
+        help="write runs to OCR_STORAGE_ROOT/OCR_DB_URL instead of an isolated benchmark store",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="ocr-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    if not args.use_configured_storage:
+        # Must happen before ocr_service is imported: the configuration is read at import time
+        os.environ.setdefault("OCR_STORAGE_ROOT", str(workdir / "storage"))
+        os.environ.setdefault("OCR_DB_URL", f"sqlite:///{workdir / 'storage' / 'bench.sqlite'}")
+        (workdir / "storage").mkdir(parents=True, exist_ok=True)
+    # Repeated runs would otherwise be answered from the result cache
+    os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+
+    print(f"Benchmark workdir: {workdir}", file=sys.stderr)
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    documents = generate_documents(
+        workdir / "documents", args.docs, kinds, args.pages, args.noise, args.skew, args.seed
+    )
+
+    if args.target == "stages":
+        results = bench_stages(documents, args.mode)
+    elif args.target == "inprocess":
+        results = bench_inprocess(documents, args.mode, args.concurrency)
+    else:
+        results = bench_http(documents, args.mode, args.concurrency, args.url, args.timeout)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "target": args.target,
+            "mode": args.mode,
+            "documents": len(documents),
+            "pages": sum(document.pages for document in documents),
+            "kinds": kinds,
+            "noise_sigma": args.noise,
+            "max_skew": args.skew,
+            "seed": args.seed,
+            "config": _config_snapshot() if args.target != "http" else None,
+        },
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(payload, encoding="utf-8")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,247 @@
 from __future__ import annotations
 
 import logging
-from typing import Annotated
+from contextlib import asynccontextmanager
+import json
+from datetime import datetime
+from typing import Annotated, Iterator, Optional
 
-from fastapi import FastAPI, File, Form, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
+from ocr_service.config import CONFIG
+from ocr_service.converter import CONVERTER_POOL
+from ocr_service.engines import PADDLE_ENGINE
+from ocr_service.jobs import JOB_QUEUE
+from ocr_service.metrics import METRICS
+from ocr_service.parallel import PAGE_POOL
+from ocr_service.retention import RETENTION
 from ocr_service.service import SERVICE, OcrMode
+from ocr_service.warmup import WARMUP
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="OCR Service", version="1.0.0")
+SINGLE_UPLOAD_PATHS = ("/ocr", "/ocr/stream")
+# Multipart boundaries and the small form fields next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Before any request can create a run: everything still queued/processing is from a previous process
+    JOB_QUEUE.recover()
+    WARMUP.start()
+    yield
+    RETENTION.stop()
+    PAGE_POOL.shutdown()
+    CONVERTER_POOL.shutdown()
+
+
+app = FastAPI(title="OCR Service", version="1.0.0", lifespan=lifespan)
+
+METRICS.callback("ocr_queue_depth", "gauge", "OCR jobs waiting in the queue", lambda: JOB_QUEUE.depth)
+METRICS.callback("ocr_queue_capacity", "gauge", "Maximum number of queued OCR jobs", lambda: JOB_QUEUE.capacity)
+METRICS.callback("ocr_ready", "gauge", "1 once models are loaded and workers started", lambda: int(WARMUP.ready))
+METRICS.callback(
+    "ocr_model_load_seconds",
+    "gauge",
+    "Time spent loading OCR models",
+    lambda: {("paddleocr",): PADDLE_ENGINE.load_seconds},
+    ("model",),
+)
+METRICS.callback(
+    "ocr_warmup_seconds",
+    "gauge",
+    "Duration of startup warmup steps",
+    lambda: {(step,): seconds for step, seconds in WARMUP.timings.items()},
+    ("step",),
+)
+METRICS.callback(
+    "ocr_converter_events_total",
+    "counter",
+    "LibreOffice conversion pool events",
+    lambda: {
+        (name,): CONVERTER_POOL.metrics()[name] for name in ("conversions", "failures", "restarts")
+    },
+    ("event",),
+)
+METRICS.callback(
+    "ocr_converter_idle_workers", "gauge", "Idle LibreOffice workers", lambda: CONVERTER_POOL.metrics()["idle"]
+)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Starlette spools the whole multipart body before an endpoint runs, so the size limit enforced while
+    # copying comes too late; a declared Content-Length lets the request be refused before it is read
+    if request.method == "POST" and request.url.path in SINGLE_UPLOAD_PATHS:
+        length = request.headers.get("content-length", "")
+        limit = CONFIG.allowed_file_size_mb * 1024 * 1024 + FORM_OVERHEAD_BYTES
+        if length.isdigit() and int(length) > limit:
+            return JSONResponse(
+                {"detail": f"File too large. Max size is {CONFIG.allowed_file_size_mb} MB"},
+                status_code=413,
+            )
+    return await call_next(request)
 
 
 @app.post("/ocr")
 async def run_ocr(
     file: UploadFile = File(...),
     mode: Annotated[OcrMode, Form()] = "auto",
+    wait: Annotated[bool, Form()] = True,
+    doc_type: Annotated[Optional[str], Form(alias="docType")] = None,
+    sampler: Annotated[Optional[str], Form()] = None,
+) -> JSONResponse:
+    # UploadFile was already spooled by Starlette; the service copies it to staging in chunks
+    if not wait:
+        run_id = await run_in_threadpool(JOB_QUEUE.submit, file.file, file.filename, mode, doc_type, sampler)
+        return JSONResponse(
+            {"run_id": run_id, "mode": mode, "status": "queued", "queue_depth": JOB_QUEUE.depth},
+            status_code=202,
+        )
+
+    result = await run_in_threadpool(SERVICE.process, file.file, file.filename, mode, doc_type, sampler)
+    payload = {
+        "run_id": result.run_id,
+        "mode": result.mode,
+        "selected_engine": result.selected_engine,
+        "summary": result.summary,
+        "pages": [
+            {
+                "page_number": res.page_number,
+                "engine": res.engine,
+                "confidence": res.confidence,
+                "text": res.text,
+            }
+            for res in result.results
+        ],
+    }
+    if result.fields:
+        payload["fields"] = result.fields
+    return JSONResponse(payload)
+
+
+def _encode_events(events: Iterator[dict], sse: bool) -> Iterator[str]:
+    try:
+        for event in events:
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n" if sse else f"{data}\n"
+    except HTTPException as exc:
+        # Headers are already sent, so failures are reported in-band
+        data = json.dumps({"event": "error", "detail": exc.detail}, ensure_ascii=False)
+        yield f"event: error\ndata: {data}\n\n" if sse else f"{data}\n"
+
+
+@app.post("/ocr/stream")
+async def stream_ocr(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: Annotated[OcrMode, Form()] = "auto",
+    doc_type: Annotated[Optional[str], Form(alias="docType")] = None,
+    sampler: Annotated[Optional[str], Form()] = None,
+) -> StreamingResponse:
+    """Stream progress and per-page results as NDJSON, or as SSE when the client accepts text/event-stream."""
+    run_id = await run_in_threadpool(
+        SERVICE.create_run, file.file, file.filename, mode, "processing", doc_type, sampler
+    )
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _encode_events(SERVICE.stream_execute(run_id), sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ocr/batch")
+async def submit_batch(
+    files: list[UploadFile] = File(...),
+    mode: Annotated[OcrMode, Form()] = "auto",
+    doc_type: Annotated[Optional[str], Form(alias="docType")] = None,
+    sampler: Annotated[Optional[str], Form()] = None,
 ) -> JSONResponse:
-    contents = await file.read()
-    result = SERVICE.process(contents, file.filename, mode=mode)
+    """Queue many documents at once; zip/tar archives are expanded into one run per member."""
+    uploads = [(upload.filename or "upload", upload.file) for upload in files]
+    batch_id, run_ids = await run_in_threadpool(JOB_QUEUE.submit_batch, uploads, mode, doc_type, sampler)
     return JSONResponse(
         {
-            "run_id": result.run_id,
-            "mode": result.mode,
-            "selected_engine": result.selected_engine,
-            "pages": [
-                {
-                    "page_number": res.page_number,
-                    "engine": res.engine,
-                    "confidence": res.confidence,
-                    "text": res.text,
-                }
-                for res in result.results
-            ],
-        }
+            "batch_id": batch_id,
+            "mode": mode,
+            "run_ids": run_ids,
+            "status": "queued",
+            "queue_depth": JOB_QUEUE.depth,
+        },
+        status_code=202,
     )
 
 
+@app.get("/ocr/batch/{batch_id}")
+async def get_batch(batch_id: int) -> JSONResponse:
+    batch = await run_in_threadpool(SERVICE.get_batch, batch_id)
+    return JSONResponse(batch)
+
+
 @app.get("/ocr/{run_id}")
-async def get_run(run_id: int) -> JSONResponse:
-    run = SERVICE.get_run(run_id)
+async def get_run(run_id: int, include: Optional[str] = None, selected: bool = False) -> JSONResponse:
+    run = await run_in_threadpool(SERVICE.get_run, run_id, include, selected)
     return JSONResponse(run)
 
 
+@app.get("/ocr/{run_id}/pages/{page_number}")
+async def get_page(
+    run_id: int,
+    page_number: int,
+    include: Optional[str] = None,
+    selected: bool = False,
+) -> JSONResponse:
+    page = await run_in_threadpool(SERVICE.get_page, run_id, page_number, include, selected)
+    return JSONResponse(page)
+
+
 @app.get("/ocr")
-async def list_runs(limit: int = 50) -> JSONResponse:
-    runs = SERVICE.list_runs(limit=limit)
-    return JSONResponse({"items": runs})
+async def list_runs(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    mode: Optional[str] = None,
+    engine_used: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> JSONResponse:
+    page = await run_in_threadpool(
+        SERVICE.list_runs,
+        limit=limit,
+        cursor=cursor,
+        status=status,
+        mode=mode,
+        engine_used=engine_used,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return JSONResponse(page)
 
 
 @app.get("/health")
 async def health() -> JSONResponse:
-    return JSONResponse({"status": "ok"})
+    # Liveness must answer even while the pools are busy, so nothing that can block runs on the event loop
+    converter = await run_in_threadpool(CONVERTER_POOL.metrics)
+    return JSONResponse(
+        {
+            "status": "ok",
+            "queue_depth": JOB_QUEUE.depth,
+            "converter": converter,
+            "retention": RETENTION.last_sweep,
+        }
+    )
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    body = await run_in_threadpool(METRICS.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    return JSONResponse(WARMUP.status(), status_code=200 if WARMUP.ready else 503)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterable, Iterator
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _skip_member(name: str) -> bool:
+    path = PurePosixPath(name)
+    return any(part.startswith(".") or part == "__MACOSX" for part in path.parts)
+
+
+def _is_seekable(source: BinaryIO) -> bool:
+    # Starlette's SpooledTemporaryFile has no seekable() before Python 3.11
+    try:
+        return bool(source.seekable())
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _iter_zip_members(archive: zipfile.ZipFile) -> Iterator[tuple[str, BinaryIO]]:
+    for info in archive.infolist():
+        if info.is_dir() or _skip_member(info.filename):
+            continue
+        with archive.open(info) as member:
+            yield PurePosixPath(info.filename).name, member
+
+
+def _iter_zip(source: BinaryIO) -> Iterator[tuple[str, BinaryIO]]:
+    # The central directory sits at the end of a zip, so zipfile needs a real seekable file
+    if _is_seekable(source):
+        with zipfile.ZipFile(source) as archive:
+            yield from _iter_zip_members(archive)
+        return
+    with tempfile.TemporaryFile() as copy:
+        shutil.copyfileobj(source, copy, COPY_CHUNK_SIZE)
+        copy.seek(0)
+        with zipfile.ZipFile(copy) as archive:
+            yield from _iter_zip_members(archive)
+
+
+def _iter_tar(source: BinaryIO) -> Iterator[tuple[str, BinaryIO]]:
+    # Stream mode reads members in order without seeking or extracting to disk
+    with tarfile.open(fileobj=source, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile() or _skip_member(info.name):
+                continue
+            member = archive.extractfile(info)
+            if member is not None:
+                yield PurePosixPath(info.name).name, member
+
+
+def iter_batch_files(uploads: Iterable[tuple[str, BinaryIO]]) -> Iterator[tuple[str, BinaryIO]]:
+    """Yield ``(filename, stream)`` for every document, expanding zip/tar archives member by member."""
+    for filename, source in uploads:
+        if not is_archive(filename):
+            yield filename, source
+        elif filename.lower().endswith(".zip"):
+            yield from _iter_zip(source)
+        else:
+            yield from _iter_tar(source)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .config import CONFIG
+from .database import OcrCacheEntry, session_scope
+from .engines import OcrEngineResult
+from .metrics import CACHE_REQUESTS
+
+LOGGER = logging.getLogger(__name__)
+
+EVICT_EVERY = 50
+# LRU order only needs to be roughly right: a hit rewrites last_used_at at most this often
+TOUCH_INTERVAL = timedelta(hours=1)
+
+
+class ResultCache:
+    """Content-addressed cache of OCR results stored in the history database.
+
+    Document entries map the SHA-256 of an upload (plus mode and engine
+    configuration) to the run that produced it; page entries keep the engine
+    results of a single preprocessed page.
+    """
+
+    def __init__(self) -> None:
+        self.config = CONFIG.cache
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def engine_fingerprint(self) -> str:
+        payload = json.dumps(
+            {
+                "tesseract": asdict(CONFIG.tesseract),
+                "paddle": asdict(CONFIG.paddle),
+                "shared_detection": CONFIG.pipeline.shared_detection,
+                # Cascade mode only runs PaddleOCR below this Tesseract confidence
+                "cascade_min_confidence": CONFIG.cascade.min_confidence,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def document_key(self, content_hash: str, mode: str) -> str:
+        # Everything deciding which pixels (or which native text) reach the engines is part of the document
+        # key; page keys hash the preprocessed image itself
+        pipeline = json.dumps(
+            {
+                "resolution": asdict(CONFIG.resolution),
+                "preprocess": asdict(CONFIG.preprocess),
+                "native_text": CONFIG.pipeline.native_text,
+                "native_min_chars": CONFIG.pipeline.native_min_chars,
+                "native_max_image_coverage": CONFIG.pipeline.native_max_image_coverage,
+            },
+            sort_keys=True,
+        )
+        raw = f"document:{content_hash}:{mode}:{self.engine_fingerprint()}:{pipeline}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def page_key(self, image: np.ndarray, mode: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"page:{mode}:{self.engine_fingerprint()}:{image.shape}:{image.dtype}".encode("utf-8"))
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def _touch(self, key: str, kind: str) -> Optional[OcrCacheEntry]:
+        now = datetime.utcnow()
+        with session_scope() as session:
+            entry = session.get(OcrCacheEntry, key)
+            if entry is None or entry.kind != kind:
+                return None
+            if entry.created_at < now - timedelta(hours=self.config.ttl_hours):
+                session.delete(entry)
+                return None
+            if entry.last_used_at < now - TOUCH_INTERVAL:
+                entry.last_used_at = now
+            return entry
+
+    @staticmethod
+    def _entry(
+        key: str, kind: str, now: datetime, run_id: Optional[int] = None, payload: bytes = b""
+    ) -> OcrCacheEntry:
+        return OcrCacheEntry(
+            key=key,
+            kind=kind,
+            run_id=run_id,
+            payload_json=None,
+            payload=payload or None,
+            size_bytes=len(payload),
+            created_at=now,
+            last_used_at=now,
+        )
+
+    def _put(self, entries: list[OcrCacheEntry]) -> None:
+        if not entries:
+            return
+        try:
+            with session_scope() as session:
+                for entry in entries:
+                    session.merge(entry)
+        except SQLAlchemyError:
+            # A cache write must never fail the OCR run itself
+            LOGGER.warning("Failed to store %d cache entries", len(entries), exc_info=True)
+            return
+        with self._lock:
+            before = self._puts
+            self._puts += len(entries)
+            should_evict = self._puts // EVICT_EVERY > before // EVICT_EVERY
+        if should_evict:
+            self.evict()
+
+    def get_document(self, key: str) -> Optional[int]:
+        if not self.enabled:
+            return None
+        entry = self._touch(key, "document")
+        CACHE_REQUESTS.inc(kind="document", result="hit" if entry else "miss")
+        return entry.run_id if entry else None
+
+    def put_document(self, key: str, run_id: int) -> None:
+        if self.enabled:
+            self._put([self._entry(key, "document", datetime.utcnow(), run_id=run_id)])
+
+    def get_page(self, key: str) -> Optional[list[OcrEngineResult]]:
+        if not self.enabled:
+            return None
+        entry = self._touch(key, "page")
+        if entry is None or not (entry.payload or entry.payload_json):
+            CACHE_REQUESTS.inc(kind="page", result="miss")
+            return None
+        CACHE_REQUESTS.inc(kind="page", result="hit")
+        data = zlib.decompress(entry.payload).decode("utf-8") if entry.payload else entry.payload_json
+        return [OcrEngineResult(**item) for item in json.loads(data)]
+
+    def put_pages(self, pages: list[tuple[str, list[OcrEngineResult]]]) -> None:
+        """Store the results of several pages in one transaction, compressed like ``OcrResultDetail``."""
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        entries: list[OcrCacheEntry] = []
+        for key, results in pages:
+            try:
+                data = json.dumps([asdict(result) for result in results], ensure_ascii=False)
+            except (TypeError, ValueError):
+                LOGGER.warning("Skipping page cache entry: results are not JSON serializable")
+                continue
+            entries.append(self._entry(key, "page", now, payload=zlib.compress(data.encode("utf-8"), 6)))
+        self._put(entries)
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until the size budget fits."""
+        expires = datetime.utcnow() - timedelta(hours=self.config.ttl_hours)
+        max_bytes = self.config.max_size_mb * 1024 * 1024
+        with session_scope() as session:
+            removed = session.execute(delete(OcrCacheEntry).where(OcrCacheEntry.created_at < expires)).rowcount
+            total = session.scalar(select(func.coalesce(func.sum(OcrCacheEntry.size_bytes), 0))) or 0
+            if total > max_bytes:
+                rows = session.execute(
+                    select(OcrCacheEntry.key, OcrCacheEntry.size_bytes).order_by(OcrCacheEntry.last_used_at)
+                ).all()
+                stale: list[str] = []
+                for key, size in rows:
+                    if total <= max_bytes:
+                        break
+                    stale.append(key)
+                    total -= size
+                for start in range(0, len(stale), 500):
+                    chunk = stale[start : start + 500]
+                    session.execute(delete(OcrCacheEntry).where(OcrCacheEntry.key.in_(chunk)))
+                removed += len(stale)
+        if removed:
+            LOGGER.info("Evicted %d OCR cache entries", removed)
+        return removed
+
+
+RESULT_CACHE = ResultCache()
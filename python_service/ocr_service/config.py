@@ -12,27 +12,48 @@ class TesseractConfig:
     psm: int = int(os.getenv("OCR_TESS_PSM", "6"))
     oem: int = int(os.getenv("OCR_TESS_OEM", "1"))
     config: str = os.getenv("OCR_TESS_CONFIG", "")
+    backend: str = os.getenv("OCR_TESS_BACKEND", "auto").lower()
 
 
 @dataclass
 class PaddleConfig:
-    use_angle_cls: bool = os.getenv("OCR_PADDLE_USE_ANGLE", "true").lower() == "true"
+    # The preprocessor turns pages upright, so per-box classification is only on by default without it
+    use_angle_cls: bool = os.getenv(
+        "OCR_PADDLE_USE_ANGLE",
+        "true" if os.getenv("OCR_PREPROCESS_ORIENTATION", "auto").lower() == "none" else "false",
+    ).lower() == "true"
     lang: str = os.getenv("OCR_PADDLE_LANG", "en")
     det_model_dir: Optional[str] = os.getenv("OCR_PADDLE_DET_MODEL")
     rec_model_dir: Optional[str] = os.getenv("OCR_PADDLE_REC_MODEL")
     use_gpu: bool = os.getenv("OCR_PADDLE_USE_GPU", "false").lower() == "true"
     enable_mkldnn: bool = os.getenv("OCR_PADDLE_MKLDNN", "true").lower() == "true"
     cpu_threads: int = int(os.getenv("OCR_PADDLE_CPU_THREADS", "4"))
+    rec_batch_num: int = int(os.getenv("OCR_PADDLE_REC_BATCH", "16"))
+    batch_size: int = int(os.getenv("OCR_PADDLE_BATCH_SIZE", "4"))
+    batch_wait_ms: int = int(os.getenv("OCR_PADDLE_BATCH_WAIT_MS", "20"))
 
 
 @dataclass
 class StorageConfig:
     base_dir: Path = Path(os.getenv("OCR_STORAGE_ROOT", "python_service_data"))
+    persist_artifacts: bool = os.getenv("OCR_PERSIST_ARTIFACTS", "true").lower() == "true"
+    artifact_writers: int = int(os.getenv("OCR_ARTIFACT_WRITERS", "2"))
+    # "compact": lossless WebP, 1-bit CCITT G4 TIFF for thresholded pages; "png" keeps the old format
+    artifact_format: str = os.getenv("OCR_ARTIFACT_FORMAT", "compact").lower()
+
+    @property
+    def runs_dir(self) -> Path:
+        return self.base_dir / "runs"
 
     @property
     def uploads_dir(self) -> Path:
         return self.base_dir / "uploads"
 
+    @property
+    def staging_dir(self) -> Path:
+        # Uploads land here before their run row exists; same filesystem as runs_dir so moves are renames
+        return self.base_dir / "staging"
+
     @property
     def intermediates_dir(self) -> Path:
         return self.base_dir / "intermediates"
@@ -45,6 +66,126 @@ class StorageConfig:
 @dataclass
 class DatabaseConfig:
     url: str = os.getenv("OCR_DB_URL", "sqlite:///python_service_data/ocr_history.sqlite")
+    pool_size: int = int(os.getenv("OCR_DB_POOL_SIZE", "8"))
+    max_overflow: int = int(os.getenv("OCR_DB_MAX_OVERFLOW", "8"))
+    busy_timeout_ms: int = int(os.getenv("OCR_DB_BUSY_TIMEOUT_MS", "10000"))
+
+
+@dataclass
+class QueueConfig:
+    workers: int = int(os.getenv("OCR_QUEUE_WORKERS", "2"))
+    max_queue_size: int = int(os.getenv("OCR_QUEUE_MAX_SIZE", "100"))
+
+
+@dataclass
+class ParallelConfig:
+    page_workers: int = int(os.getenv("OCR_PAGE_WORKERS", "1"))
+    page_threads: int = int(os.getenv("OCR_PAGE_THREADS", "4"))
+    max_cpu_threads: int = int(os.getenv("OCR_MAX_CPU_THREADS", str(os.cpu_count() or 1)))
+
+
+@dataclass
+class PreprocessConfig:
+    steps: str = os.getenv("OCR_PREPROCESS_STEPS", "denoise,clahe,sharpen,threshold")
+    adaptive: bool = os.getenv("OCR_PREPROCESS_ADAPTIVE", "true").lower() == "true"
+    denoiser: str = os.getenv("OCR_PREPROCESS_DENOISER", "auto").lower()
+    noise_threshold: float = float(os.getenv("OCR_PREPROCESS_NOISE_THRESHOLD", "2.5"))
+    strong_noise_threshold: float = float(os.getenv("OCR_PREPROCESS_STRONG_NOISE_THRESHOLD", "8.0"))
+    contrast_threshold: float = float(os.getenv("OCR_PREPROCESS_CONTRAST_THRESHOLD", "120"))
+    denoise_scale: float = float(os.getenv("OCR_PREPROCESS_DENOISE_SCALE", "0.5"))
+    # Page orientation/skew correction: auto (projection profiles, OSD when unsure), projection, osd, none
+    orientation: str = os.getenv("OCR_PREPROCESS_ORIENTATION", "auto").lower()
+    max_skew: float = float(os.getenv("OCR_PREPROCESS_MAX_SKEW", "10"))
+    min_skew: float = float(os.getenv("OCR_PREPROCESS_MIN_SKEW", "0.3"))
+
+    @property
+    def enabled_steps(self) -> set[str]:
+        return {step.strip().lower() for step in self.steps.split(",") if step.strip()}
+
+
+@dataclass
+class PipelineConfig:
+    render_batch_pages: int = int(os.getenv("OCR_RENDER_BATCH_PAGES", "2"))
+    prefetch_pages: int = int(os.getenv("OCR_PREFETCH_PAGES", "2"))
+    native_text: bool = os.getenv("OCR_NATIVE_TEXT", "true").lower() == "true"
+    native_min_chars: int = int(os.getenv("OCR_NATIVE_MIN_CHARS", "30"))
+    # Pages whose images cover more than this share of the page are OCRed even with a text layer (scans)
+    native_max_image_coverage: float = float(os.getenv("OCR_NATIVE_MAX_IMAGE_COVERAGE", "0.5"))
+    # Auto mode: detect lines once with PaddleOCR, recognize the crops with both engines and merge per line.
+    # Opt-in: it reports selected_engine "merged" and its Paddle calls skip the cross-page micro-batcher
+    shared_detection: bool = os.getenv("OCR_SHARED_DETECTION", "false").lower() == "true"
+
+
+@dataclass
+class ResolutionConfig:
+    # Pick the render DPI / image scale per page from the measured text height instead of a fixed 300 DPI
+    adaptive: bool = os.getenv("OCR_RESOLUTION_ADAPTIVE", "true").lower() == "true"
+    default_dpi: int = int(os.getenv("OCR_RENDER_DPI", "300"))
+    min_dpi: int = int(os.getenv("OCR_RENDER_MIN_DPI", "150"))
+    max_dpi: int = int(os.getenv("OCR_RENDER_MAX_DPI", "300"))
+    probe_dpi: int = int(os.getenv("OCR_RENDER_PROBE_DPI", "100"))
+    target_text_px: float = float(os.getenv("OCR_TARGET_TEXT_PX", "24"))
+    max_megapixels: float = float(os.getenv("OCR_MAX_PAGE_MEGAPIXELS", "12"))
+    min_image_side: int = int(os.getenv("OCR_MIN_IMAGE_SIDE", "1600"))
+    # 0 disables re-rendering low-confidence pages at rerender_dpi (or full resolution for images)
+    rerender_below_confidence: float = float(os.getenv("OCR_RERENDER_BELOW_CONFIDENCE", "0"))
+    rerender_dpi: int = int(os.getenv("OCR_RERENDER_DPI", "400"))
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    ttl_hours: int = int(os.getenv("OCR_CACHE_TTL_HOURS", "168"))
+    max_size_mb: int = int(os.getenv("OCR_CACHE_MAX_MB", "512"))
+
+
+@dataclass
+class ConverterConfig:
+    pool_size: int = int(os.getenv("OCR_SOFFICE_POOL_SIZE", "2"))
+    unoserver_bin: str = os.getenv("OCR_UNOSERVER_BIN", "unoserver")
+    soffice_bin: str = os.getenv("OCR_SOFFICE_BIN", "libreoffice")
+    host: str = os.getenv("OCR_SOFFICE_HOST", "127.0.0.1")
+    base_port: int = int(os.getenv("OCR_SOFFICE_BASE_PORT", "2003"))
+    profile_dir: Path = Path(os.getenv("OCR_SOFFICE_PROFILE_DIR", "python_service_data/soffice_profiles"))
+    timeout_seconds: int = int(os.getenv("OCR_SOFFICE_TIMEOUT", "120"))
+    startup_timeout_seconds: int = int(os.getenv("OCR_SOFFICE_STARTUP_TIMEOUT", "60"))
+
+
+@dataclass
+class CascadeConfig:
+    min_confidence: float = float(os.getenv("OCR_CASCADE_MIN_CONFIDENCE", "80"))
+
+
+@dataclass
+class BatchConfig:
+    max_files: int = int(os.getenv("OCR_BATCH_MAX_FILES", "500"))
+
+
+@dataclass
+class TemplateConfig:
+    # Shared with the .NET API: templates/samplers.json plus one <DOC_TYPE>.json per document type
+    templates_dir: Path = Path(
+        os.getenv("OCR_TEMPLATES_DIR", str(Path(__file__).resolve().parents[2] / "templates"))
+    )
+    field_height: int = int(os.getenv("OCR_FIELD_HEIGHT", "64"))
+
+
+@dataclass
+class RetentionConfig:
+    enabled: bool = os.getenv("OCR_RETENTION_ENABLED", "true").lower() == "true"
+    interval_minutes: float = float(os.getenv("OCR_RETENTION_INTERVAL_MINUTES", "30"))
+    # Whole run directories, upload included, are removed this long after creation; 0 keeps them forever
+    originals_days: float = float(os.getenv("OCR_RETENTION_ORIGINALS_DAYS", "30"))
+    # Page renders, preprocessed pages and conversions of finished runs; 0 drops them at the first sweep
+    # after completion, a negative value keeps them as long as the originals
+    intermediates_hours: float = float(os.getenv("OCR_RETENTION_INTERMEDIATES_HOURS", "24"))
+    keep_failed: bool = os.getenv("OCR_RETENTION_KEEP_FAILED", "true").lower() == "true"
+    batch_size: int = int(os.getenv("OCR_RETENTION_BATCH", "200"))
+
+
+@dataclass
+class WarmupConfig:
+    enabled: bool = os.getenv("OCR_WARMUP", "true").lower() == "true"
 
 
 @dataclass
@@ -53,6 +194,18 @@ class AppConfig:
     database: DatabaseConfig = DatabaseConfig()
     tesseract: TesseractConfig = TesseractConfig()
     paddle: PaddleConfig = PaddleConfig()
+    queue: QueueConfig = QueueConfig()
+    parallel: ParallelConfig = ParallelConfig()
+    preprocess: PreprocessConfig = PreprocessConfig()
+    pipeline: PipelineConfig = PipelineConfig()
+    resolution: ResolutionConfig = ResolutionConfig()
+    cache: CacheConfig = CacheConfig()
+    converter: ConverterConfig = ConverterConfig()
+    cascade: CascadeConfig = CascadeConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    batch: BatchConfig = BatchConfig()
+    templates: TemplateConfig = TemplateConfig()
+    retention: RetentionConfig = RetentionConfig()
     allowed_file_size_mb: int = int(os.getenv("OCR_MAX_FILE_MB", "25"))
 
 
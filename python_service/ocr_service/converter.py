@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import logging
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout: float) -> None:
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+@dataclass
+class ConversionStats:
+    conversions: int = 0
+    failures: int = 0
+    restarts: int = 0
+    total_seconds: float = 0.0
+    last_seconds: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        average = self.total_seconds / self.conversions if self.conversions else None
+        return {
+            "conversions": self.conversions,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "avg_seconds": average,
+            "last_seconds": self.last_seconds,
+        }
+
+
+class SofficeWorker:
+    """One long-lived headless LibreOffice behind a unoserver XML-RPC socket."""
+
+    def __init__(self, index: int) -> None:
+        self.config = CONFIG.converter
+        self.index = index
+        self.port = self.config.base_port + index * 2
+        self.uno_port = self.port + 1
+        self.profile_dir = (self.config.profile_dir / f"worker_{index}").resolve()
+        self._process: Optional[subprocess.Popen] = None
+
+    def _port_open(self) -> bool:
+        try:
+            with socket.create_connection((self.config.host, self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def healthy(self) -> bool:
+        return self._process is not None and self._process.poll() is None and self._port_open()
+
+    def start(self) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        LOGGER.info("Starting LibreOffice worker %d on port %d", self.index, self.port)
+        self._process = subprocess.Popen(
+            [
+                self.config.unoserver_bin,
+                "--interface",
+                self.config.host,
+                "--port",
+                str(self.port),
+                "--uno-port",
+                str(self.uno_port),
+                "--user-installation",
+                self.profile_dir.as_uri(),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.config.startup_timeout_seconds
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"LibreOffice worker {self.index} exited during startup")
+            if self._port_open():
+                return
+            time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"LibreOffice worker {self.index} did not start in time")
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+    def convert(self, source: Path, target: Path) -> None:
+        proxy = xmlrpc.client.ServerProxy(
+            f"http://{self.config.host}:{self.port}",
+            allow_none=True,
+            transport=_TimeoutTransport(self.config.timeout_seconds),
+        )
+        # unoserver convert(inpath, indata, outpath, convert_to, filtername, filter_options, update_index)
+        proxy.convert(str(source.resolve()), None, str(target.resolve()), "pdf", None, [], True)
+
+
+class ConverterPool:
+    """Pool of warm LibreOffice instances used to turn DOC/DOCX uploads into PDF."""
+
+    def __init__(self) -> None:
+        self.config = CONFIG.converter
+        self.stats = ConversionStats()
+        self._idle: queue.Queue[SofficeWorker] = queue.Queue()
+        self._workers: list[SofficeWorker] = []
+        self._lock = threading.Lock()
+        # Counters get their own lock so /health and /metrics never wait behind a booting worker
+        self._stats_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.pool_size > 0 and shutil.which(self.config.unoserver_bin) is not None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._workers or not self.enabled:
+                return
+            workers = [SofficeWorker(index) for index in range(self.config.pool_size)]
+            self._workers = workers
+        # Booting can take startup_timeout_seconds per worker; conversions wait on the idle queue meanwhile
+        for worker in workers:
+            try:
+                worker.start()
+            except RuntimeError:
+                # A worker that fails to boot is retried on its first checkout
+                LOGGER.exception("LibreOffice worker %d failed to start", worker.index)
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.stop()
+
+    def _record(self, elapsed: Optional[float], failed: bool = False, restarted: bool = False) -> None:
+        with self._stats_lock:
+            if failed:
+                self.stats.failures += 1
+            if restarted:
+                self.stats.restarts += 1
+            if elapsed is not None:
+                self.stats.conversions += 1
+                self.stats.total_seconds += elapsed
+                self.stats.last_seconds = elapsed
+
+    def _convert_oneshot(self, source: Path, target: Path) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir_path = Path(tmpdir)
+            # A private profile keeps concurrent conversions from locking each other out
+            profile = (tmpdir_path / "profile").as_uri()
+            try:
+                result = subprocess.run(
+                    [
+                        self.config.soffice_bin,
+                        f"-env:UserInstallation={profile}",
+                        "--headless",
+                        "--convert-to",
+                        "pdf",
+                        str(source),
+                        "--outdir",
+                        str(tmpdir_path),
+                    ],
+                    capture_output=True,
+                    check=False,
+                    timeout=self.config.timeout_seconds,
+                )
+            except subprocess.TimeoutExpired as exc:
+                raise RuntimeError(f"DOCX conversion timed out after {self.config.timeout_seconds}s") from exc
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Failed to convert DOCX to PDF: {result.stderr.decode('utf-8', errors='ignore')}"
+                )
+            pdf_files = list(tmpdir_path.glob("*.pdf"))
+            if not pdf_files:
+                raise RuntimeError("DOCX conversion did not produce a PDF")
+            shutil.move(str(pdf_files[0]), target)
+
+    def convert(self, source: Path) -> Path:
+        target = source.with_suffix(".pdf")
+        started = time.perf_counter()
+        if not self.enabled:
+            try:
+                self._convert_oneshot(source, target)
+            except RuntimeError:
+                self._record(None, failed=True)
+                raise
+            self._record(time.perf_counter() - started)
+            return target
+
+        if not self._workers:
+            self.start()
+        try:
+            worker = self._idle.get(timeout=self.config.timeout_seconds)
+        except queue.Empty as exc:
+            raise RuntimeError("No LibreOffice worker available for conversion") from exc
+        try:
+            if not worker.healthy():
+                worker.restart()
+                self._record(None, restarted=True)
+            worker.convert(source, target)
+        except (OSError, xmlrpc.client.Error) as exc:
+            # Covers socket timeouts on a hung instance: recycle it before handing it back
+            self._record(None, failed=True)
+            try:
+                worker.restart()
+                self._record(None, restarted=True)
+            except RuntimeError:
+                LOGGER.exception("LibreOffice worker %d failed to restart", worker.index)
+            raise RuntimeError(f"Failed to convert DOCX to PDF: {exc}") from exc
+        except RuntimeError:
+            self._record(None, failed=True)
+            raise
+        finally:
+            self._idle.put(worker)
+
+        if not target.exists():
+            self._record(None, failed=True)
+            raise RuntimeError("DOCX conversion did not produce a PDF")
+        self._record(time.perf_counter() - started)
+        return target
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            data = self.stats.as_dict()
+        data["pool_size"] = len(self._workers)
+        data["idle"] = self._idle.qsize()
+        return data
+
+
+CONVERTER_POOL = ConverterPool()
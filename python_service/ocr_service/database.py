@@ -1,31 +1,76 @@
 from __future__ import annotations
 
 import json
+import zlib
 from contextlib import contextmanager
 from datetime import datetime
 from typing import Generator, Optional
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, create_engine, event
+from sqlalchemy import (
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    create_engine,
+    event,
+    inspect,
+    text,
+)
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship, sessionmaker
 
 from .config import CONFIG
 
 
+# Bulky engine output (Tesseract word boxes, raw Paddle lines, per-line readings) kept out of extra_json
+DETAIL_KEYS = ("word_data", "raw", "lines")
+
+IS_SQLITE = CONFIG.database.url.startswith("sqlite")
+
+
 def _enforce_foreign_keys(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.close()
 
 
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={CONFIG.database.busy_timeout_ms}")
+    cursor.close()
+
+
 class Base(DeclarativeBase):
     pass
 
 
+class OcrBatch(Base):
+    __tablename__ = "ocr_batches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    mode: Mapped[str] = mapped_column(String(32), nullable=False)
+    file_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    runs: Mapped[list[OcrRun]] = relationship("OcrRun", back_populates="batch")
+
+
 class OcrRun(Base):
     __tablename__ = "ocr_runs"
+    __table_args__ = (
+        Index("ix_ocr_runs_created_at_id", "created_at", "id"),
+        Index("ix_ocr_runs_status", "status"),
+        Index("ix_ocr_runs_batch_id", "batch_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    batch_id: Mapped[Optional[int]] = mapped_column(ForeignKey("ocr_batches.id", ondelete="SET NULL"))
     original_file: Mapped[str] = mapped_column(String(1024), nullable=False)
     original_mime: Mapped[Optional[str]] = mapped_column(String(128))
     mode: Mapped[str] = mapped_column(String(32), nullable=False)
@@ -35,9 +80,12 @@ class OcrRun(Base):
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set by the retention sweeper once the run directory has been deleted
+    artifacts_purged_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
     images: Mapped[list[OcrImage]] = relationship("OcrImage", back_populates="run", cascade="all, delete-orphan")
     results: Mapped[list[OcrResult]] = relationship("OcrResult", back_populates="run", cascade="all, delete-orphan")
+    batch: Mapped[Optional[OcrBatch]] = relationship("OcrBatch", back_populates="runs")
 
     def set_extra(self, data: dict | None) -> None:
         self.extras_json = json.dumps(data, ensure_ascii=False) if data else None
@@ -45,9 +93,13 @@ class OcrRun(Base):
     def get_extra(self) -> dict:
         return json.loads(self.extras_json) if self.extras_json else {}
 
+    def update_extra(self, data: dict) -> None:
+        self.set_extra({**self.get_extra(), **data})
+
 
 class OcrImage(Base):
     __tablename__ = "ocr_images"
+    __table_args__ = (Index("ix_ocr_images_run_id", "run_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     run_id: Mapped[int] = mapped_column(ForeignKey("ocr_runs.id", ondelete="CASCADE"), nullable=False)
@@ -68,6 +120,7 @@ class OcrImage(Base):
 
 class OcrResult(Base):
     __tablename__ = "ocr_results"
+    __table_args__ = (Index("ix_ocr_results_run_id", "run_id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     run_id: Mapped[int] = mapped_column(ForeignKey("ocr_runs.id", ondelete="CASCADE"), nullable=False)
@@ -80,27 +133,110 @@ class OcrResult(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     run: Mapped[OcrRun] = relationship("OcrRun", back_populates="results")
+    detail: Mapped[Optional[OcrResultDetail]] = relationship(
+        "OcrResultDetail",
+        back_populates="result",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
     def set_extra(self, data: dict | None) -> None:
-        self.extra_json = json.dumps(data, ensure_ascii=False) if data else None
+        data = data or {}
+        light = {key: value for key, value in data.items() if key not in DETAIL_KEYS}
+        heavy = {key: value for key, value in data.items() if key in DETAIL_KEYS}
+        self.extra_json = json.dumps(light, ensure_ascii=False) if light else None
+        if heavy:
+            self.detail = OcrResultDetail()
+            self.detail.set_data(heavy)
 
-    def get_extra(self) -> dict:
-        return json.loads(self.extra_json) if self.extra_json else {}
+    def get_extra(self, include_details: bool = False) -> dict:
+        data = json.loads(self.extra_json) if self.extra_json else {}
+        if include_details and self.detail is not None:
+            data.update(self.detail.get_data())
+        return data
 
 
-engine: Engine = create_engine(CONFIG.database.url, future=True, echo=False)
+class OcrResultDetail(Base):
+    """Compressed word-level engine output, loaded only when a client asks for it."""
+
+    __tablename__ = "ocr_result_details"
+
+    result_id: Mapped[int] = mapped_column(ForeignKey("ocr_results.id", ondelete="CASCADE"), primary_key=True)
+    encoding: Mapped[str] = mapped_column(String(16), nullable=False, default="json+zlib")
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    result: Mapped[OcrResult] = relationship("OcrResult", back_populates="detail")
+
+    def set_data(self, data: dict) -> None:
+        self.encoding = "json+zlib"
+        self.payload = zlib.compress(json.dumps(data, ensure_ascii=False, default=float).encode("utf-8"), 6)
+
+    def get_data(self) -> dict:
+        return json.loads(zlib.decompress(self.payload).decode("utf-8"))
+
+
+class OcrCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+    __table_args__ = (Index("ix_ocr_cache_last_used_at", "last_used_at"),)
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    run_id: Mapped[Optional[int]] = mapped_column(ForeignKey("ocr_runs.id", ondelete="CASCADE"))
+    # Entries written before page payloads were compressed; new ones use ``payload``
+    payload_json: Mapped[Optional[str]] = mapped_column(Text)
+    payload: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+engine: Engine = create_engine(
+    CONFIG.database.url,
+    future=True,
+    echo=False,
+    pool_size=CONFIG.database.pool_size,
+    max_overflow=CONFIG.database.max_overflow,
+    pool_pre_ping=True,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+)
 
 
 @event.listens_for(engine, "connect")
 def _on_connect(dbapi_connection, connection_record):
     _enforce_foreign_keys(dbapi_connection, connection_record)
+    if IS_SQLITE:
+        _configure_sqlite(dbapi_connection, connection_record)
 
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 
+def _ensure_indexes() -> None:
+    # create_all() skips tables that already exist, so databases created before the
+    # indexes were declared get them here; checkfirst keeps this idempotent
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+
+def _ensure_columns() -> None:
+    # create_all() does not alter existing tables either: add nullable columns declared later
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    _ensure_columns()
+    _ensure_indexes()
 
 
 @contextmanager
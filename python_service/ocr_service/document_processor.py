@@ -1,16 +1,36 @@
 from __future__ import annotations
 
 import mimetypes
-import shutil
+import queue
+import re
 import subprocess
-import tempfile
-from dataclasses import dataclass
+import threading
+import zipfile
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, TypeVar
+from xml.etree import ElementTree
 
-from pdf2image import convert_from_path
+import cv2
+import numpy as np
+from pdf2image import convert_from_path, pdfinfo_from_path
 
-from .preprocess import PREPROCESSOR, PreprocessResult
+from .config import CONFIG
+from .converter import CONVERTER_POOL
+from .engines import OcrEngineResult
+from .metrics import RunTimings
+from .preprocess import PREPROCESSOR, PageImage, PreprocessResult
+from .resolution import RESOLUTION_POLICY, Resolution
+from .storage import STORAGE
+
+T = TypeVar("T")
+
+NATIVE_ENGINE = "native_text"
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Text boxes are stored twice: as DrawingML (mc:Choice) and as a VML fallback
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_PAGE_SIZE = re.compile(r"^Page\s+(\d+)\s+size:\s+([\d.]+)\s+x\s+([\d.]+)\s+pts", re.MULTILINE)
 
 
 SUPPORTED_IMAGE_TYPES = {
@@ -27,88 +47,373 @@ SUPPORTED_IMAGE_TYPES = {
 class PreparedDocument:
     original_path: Path
     mime_type: Optional[str]
-    page_images: list[Path]
-    preprocessed: list[PreprocessResult]
+    pages: Iterator[PreprocessResult]
     converted_files: list[tuple[str, Path]]
+    page_count: Optional[int] = None
+    # Artifact records (images released) filled in while ``pages`` is consumed
+    page_images: list[PageImage] = field(default_factory=list)
+    preprocessed: list[PreprocessResult] = field(default_factory=list)
+    # Pages read from an embedded text layer; they never reach the OCR engines
+    native_results: list[OcrEngineResult] = field(default_factory=list)
+    timings: RunTimings = field(default_factory=RunTimings)
+    # Rendered PDF (original or converted) or the uploaded image, kept for high-DPI re-renders
+    render_source: Optional[Path] = None
+
+
+def _prefetch(items: Iterator[T], depth: int) -> Iterator[T]:
+    """Run ``items`` in a background thread, keeping at most ``depth`` results buffered."""
+    if depth <= 0:
+        yield from items
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(("item", item)):
+                    return
+            put(("done", None))
+        except BaseException as exc:  # noqa: BLE001
+            put(("error", exc))
+
+    producer = threading.Thread(target=produce, name="ocr-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item = buffer.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        stop.set()
 
 
 class DocumentProcessor:
     def __init__(self) -> None:
         self.preprocessor = PREPROCESSOR
+        self.config = CONFIG.pipeline
 
     def detect_mime(self, file_path: Path) -> Optional[str]:
         mime, _ = mimetypes.guess_type(file_path)
         return mime
 
     def _convert_docx_to_pdf(self, docx_path: Path) -> Path:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmpdir_path = Path(tmpdir)
-            result = subprocess.run(
-                [
-                    "libreoffice",
-                    "--headless",
-                    "--convert-to",
-                    "pdf",
-                    str(docx_path),
-                    "--outdir",
-                    str(tmpdir_path),
-                ],
-                capture_output=True,
-                check=False,
+        return CONVERTER_POOL.convert(docx_path)
+
+    def _native_result(self, text: str, page_number: int) -> OcrEngineResult:
+        return OcrEngineResult(
+            text=text,
+            confidence=100.0,
+            engine=NATIVE_ENGINE,
+            page_number=page_number,
+            extra={"source": "text_layer"},
+        )
+
+    def _has_native_text(self, text: str) -> bool:
+        return len("".join(text.split())) >= self.config.native_min_chars
+
+    def _extract_pdf_text(self, pdf_path: Path) -> list[str]:
+        result = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", str(pdf_path), "-"],
+            capture_output=True,
+            check=False,
+            timeout=120,
+        )
+        if result.returncode != 0:
+            return []
+        # pdftotext terminates every page with a form feed
+        return result.stdout.decode("utf-8", errors="ignore").split("\f")
+
+    def _image_coverage(self, pdf_path: Path, page_count: int) -> dict[int, float]:
+        """Share of each page covered by embedded images, from ``pdfimages -list`` and ``pdfinfo`` page sizes.
+
+        A scan with a small (or OCR-generated) text layer is one page-sized image; pages missing from the
+        result have no images. Sizes that cannot be read count as fully covered so the page is OCRed.
+        """
+        args = ["-f", "1", "-l", str(page_count), str(pdf_path)]
+        info = subprocess.run(["pdfinfo", *args], capture_output=True, check=False, timeout=120)
+        images = subprocess.run(["pdfimages", "-list", *args], capture_output=True, check=False, timeout=120)
+        if images.returncode != 0:
+            return {page: 1.0 for page in range(1, page_count + 1)}
+        page_area = {
+            int(page): float(width) * float(height) / (72 * 72)
+            for page, width, height in _PAGE_SIZE.findall(info.stdout.decode("utf-8", errors="ignore"))
+        }
+        covered: dict[int, float] = {}
+        # page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+        for line in images.stdout.decode("utf-8", errors="ignore").splitlines()[2:]:
+            columns = line.split()
+            if len(columns) < 14 or columns[2] != "image":
+                continue
+            page = int(columns[0])
+            width, height = float(columns[3]), float(columns[4])
+            x_ppi, y_ppi = float(columns[12]), float(columns[13])
+            area = page_area.get(page, 0.0)
+            if x_ppi <= 0 or y_ppi <= 0 or area <= 0:
+                covered[page] = 1.0
+                continue
+            covered[page] = min(1.0, covered.get(page, 0.0) + (width / x_ppi) * (height / y_ppi) / area)
+        return covered
+
+    def _extract_docx_text(self, docx_path: Path) -> Optional[str]:
+        """Read the body text of a DOCX, or None when it embeds images that may hold text."""
+        try:
+            with zipfile.ZipFile(docx_path) as archive:
+                if any(name.startswith("word/media/") for name in archive.namelist()):
+                    return None
+                root = ElementTree.fromstring(archive.read("word/document.xml"))
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+            return None
+        paragraphs: list[str] = []
+        for paragraph in self._docx_nodes(root, f"{_WORD_NS}p"):
+            # Paragraphs nested in a text box of this one are listed on their own
+            parts: list[str] = []
+            for node in self._docx_nodes(paragraph, None, skip=f"{_WORD_NS}p"):
+                if node.tag == f"{_WORD_NS}t" and node.text:
+                    parts.append(node.text)
+                elif node.tag == f"{_WORD_NS}tab":
+                    parts.append("\t")
+                elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                    parts.append("\n")
+            paragraphs.append("".join(parts))
+        return "\n".join(paragraphs).strip()
+
+    @classmethod
+    def _docx_nodes(
+        cls, parent: ElementTree.Element, tag: Optional[str], skip: Optional[str] = None
+    ) -> Iterator[ElementTree.Element]:
+        """Descendants in document order (only ``tag`` when set), without ``skip`` and fallback subtrees."""
+        for node in parent:
+            if node.tag in (skip, _MC_FALLBACK):
+                continue
+            if tag is None or node.tag == tag:
+                yield node
+            yield from cls._docx_nodes(node, tag, skip)
+
+    def _probe_dpis(self, pdf_path: Path, batch: list[int], timings: RunTimings) -> list[Resolution]:
+        if not RESOLUTION_POLICY.config.adaptive:
+            return [RESOLUTION_POLICY.pdf_dpi(None) for _ in batch]
+        with timings.span("resolution_probe"):
+            probes = convert_from_path(
+                str(pdf_path),
+                dpi=RESOLUTION_POLICY.config.probe_dpi,
+                first_page=batch[0],
+                last_page=batch[-1],
+                grayscale=True,
+            )
+            resolutions = []
+            for probe in probes:
+                resolutions.append(RESOLUTION_POLICY.pdf_dpi(np.asarray(probe)))
+                probe.close()
+        return resolutions
+
+    def _iter_pdf_pages(
+        self,
+        pdf_path: Path,
+        output_dir: Path,
+        page_numbers: list[int],
+        timings: Optional[RunTimings] = None,
+        dpi: Optional[int] = None,
+    ) -> Iterator[PageImage]:
+        """Render pages at the DPI the resolution policy picks for each, or at a fixed ``dpi``."""
+        # Render a few consecutive pages at a time so memory does not grow with the page count
+        timings = timings or RunTimings()
+        batch_size = max(1, self.config.render_batch_pages)
+        batches: list[list[int]] = []
+        for number in page_numbers:
+            if batches and number == batches[-1][-1] + 1 and len(batches[-1]) < batch_size:
+                batches[-1].append(number)
+            else:
+                batches.append([number])
+        for batch in batches:
+            if dpi is None:
+                resolutions = self._probe_dpis(pdf_path, batch, timings)
+            else:
+                resolutions = [Resolution(dpi=dpi) for _ in batch]
+            # Consecutive pages that share a DPI are still rendered with one pdftoppm call
+            groups: list[list[tuple[int, Resolution]]] = []
+            for idx, resolution in zip(batch, resolutions):
+                if groups and groups[-1][-1][1].dpi == resolution.dpi:
+                    groups[-1].append((idx, resolution))
+                else:
+                    groups.append([(idx, resolution)])
+            for group in groups:
+                with timings.span("render"):
+                    pages = convert_from_path(
+                        str(pdf_path), dpi=group[0][1].dpi, first_page=group[0][0], last_page=group[-1][0]
+                    )
+                for (idx, resolution), page in zip(group, pages):
+                    image = cv2.cvtColor(np.asarray(page.convert("RGB")), cv2.COLOR_RGB2BGR)
+                    page.close()
+                    suffix = "" if dpi is None else f"_{dpi}dpi"
+                    path = STORAGE.save_image(image, output_dir / f"page_{idx:03d}{suffix}.png")
+                    yield PageImage(
+                        page_number=idx, image=image, source="pdf_render", path=path, resolution=resolution
+                    )
+
+    def _load_image(self, image_path: Path, fit: bool = True) -> PageImage:
+        image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Cannot read image: {image_path}")
+        if not fit:
+            height, width = image.shape[:2]
+            resolution = Resolution(original_size=(width, height))
+        else:
+            image, resolution = RESOLUTION_POLICY.fit_image(image)
+        # The upload itself is the page artifact, no copy needed
+        return PageImage(page_number=1, image=image, source="upload", path=image_path, resolution=resolution)
+
+    def _preprocess_pages(
+        self,
+        pages: Iterator[PageImage],
+        prepared: PreparedDocument,
+        run_dirs: dict[str, Path],
+        suffix: str = "",
+    ) -> Iterator[PreprocessResult]:
+        for page in pages:
+            with prepared.timings.span("preprocess"):
+                result = self.preprocessor.enhance(page)
+            for step, elapsed_ms in result.timings_ms.items():
+                prepared.timings.add(f"preprocess.{step}", elapsed_ms / 1000)
+            if page.resolution is not None:
+                result.details["resolution"] = page.resolution.as_dict()
+            result.processed_path = STORAGE.save_image(
+                result.image,
+                run_dirs["intermediates"] / f"page_{page.page_number:03d}{suffix}_processed.png",
+                binary="adaptive_threshold" in result.steps,
             )
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Failed to convert DOCX to PDF: {result.stderr.decode('utf-8', errors='ignore')}"
-                )
-            pdf_files = list(tmpdir_path.glob("*.pdf"))
-            if not pdf_files:
-                raise RuntimeError("DOCX conversion did not produce a PDF")
-            target_pdf = docx_path.with_suffix(".pdf")
-            shutil.move(str(pdf_files[0]), target_pdf)
-            return target_pdf
-
-    def _convert_pdf_to_images(self, pdf_path: Path, output_dir: Path) -> list[Path]:
-        pages = convert_from_path(str(pdf_path), dpi=300)
-        image_paths: list[Path] = []
-        for idx, page in enumerate(pages, start=1):
-            image_path = self.preprocessor.save_pdf_page(page, output_dir, f"page_{idx:03d}")
-            image_paths.append(image_path)
-        return image_paths
-
-    def _copy_image(self, image_path: Path, output_dir: Path) -> Path:
-        target = output_dir / image_path.name
-        shutil.copy(image_path, target)
-        return target
-
-    def prepare(self, file_path: Path, run_dirs: dict[str, Path]) -> PreparedDocument:
+            prepared.page_images.append(replace(page, image=None))
+            prepared.preprocessed.append(replace(result, image=None))
+            yield result
+
+    def load_first_page(
+        self,
+        file_path: Path,
+        run_dirs: dict[str, Path],
+        timings: Optional[RunTimings] = None,
+    ) -> PageImage:
+        """Raw first page of an upload, without preprocessing (template field extraction)."""
+        timings = timings or RunTimings()
+        suffix = file_path.suffix.lower()
+        if suffix in {".doc", ".docx", ".pdf"}:
+            pdf_path = file_path
+            if suffix in {".doc", ".docx"}:
+                with timings.span("convert"):
+                    pdf_path = self._convert_docx_to_pdf(file_path)
+            return next(self._iter_pdf_pages(pdf_path, run_dirs["uploads"], [1], timings))
+        if self.detect_mime(file_path) in SUPPORTED_IMAGE_TYPES:
+            with timings.span("decode"):
+                return self._load_image(file_path)
+        raise ValueError(f"Unsupported file type: {file_path.suffix}")
+
+    def prepare(
+        self,
+        file_path: Path,
+        run_dirs: dict[str, Path],
+        timings: Optional[RunTimings] = None,
+    ) -> PreparedDocument:
+        """Convert the upload and return a document whose pages are rendered and preprocessed lazily."""
+        timings = timings or RunTimings()
         mime = self.detect_mime(file_path)
-        page_images: list[Path] = []
         converted_files: list[tuple[str, Path]] = []
 
-        if file_path.suffix.lower() in {".doc", ".docx"}:
-            pdf_path = self._convert_docx_to_pdf(file_path)
-            page_images = self._convert_pdf_to_images(pdf_path, run_dirs["uploads"])
-            converted_files.append(("docx_to_pdf", pdf_path))
-        elif file_path.suffix.lower() in {".pdf"}:
-            page_images = self._convert_pdf_to_images(file_path, run_dirs["uploads"])
+        native_results: list[OcrEngineResult] = []
+        render_source: Optional[Path] = None
+        suffix = file_path.suffix.lower()
+        docx_text = None
+        if suffix == ".docx" and self.config.native_text:
+            with timings.span("docx_text"):
+                docx_text = self._extract_docx_text(file_path)
+
+        if docx_text is not None and self._has_native_text(docx_text):
+            page_count = 1
+            native_results.append(self._native_result(docx_text, 1))
+            page_images: Iterator[PageImage] = iter(())
+        elif suffix in {".doc", ".docx", ".pdf"}:
+            pdf_path = file_path
+            if suffix in {".doc", ".docx"}:
+                with timings.span("convert"):
+                    pdf_path = self._convert_docx_to_pdf(file_path)
+                converted_files.append(("docx_to_pdf", pdf_path))
+            page_count = int(pdfinfo_from_path(str(pdf_path))["Pages"])
+            if self.config.native_text:
+                with timings.span("pdf_text"):
+                    page_texts = self._extract_pdf_text(pdf_path)
+                    coverage = (
+                        self._image_coverage(pdf_path, page_count)
+                        if any(self._has_native_text(text) for text in page_texts)
+                        else {}
+                    )
+                max_coverage = self.config.native_max_image_coverage
+                for idx, text in enumerate(page_texts[:page_count], start=1):
+                    if self._has_native_text(text) and coverage.get(idx, 0.0) <= max_coverage:
+                        native_results.append(self._native_result(text.strip(), idx))
+            native_pages = {result.page_number for result in native_results}
+            ocr_pages = [idx for idx in range(1, page_count + 1) if idx not in native_pages]
+            page_images = self._iter_pdf_pages(pdf_path, run_dirs["uploads"], ocr_pages, timings)
+            render_source = pdf_path
         elif mime in SUPPORTED_IMAGE_TYPES:
-            copied = self._copy_image(file_path, run_dirs["uploads"])
-            page_images = [copied]
+            page_count = 1
+            render_source = file_path
+            with timings.span("decode"):
+                page_images = iter([self._load_image(file_path)])
         else:
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
 
-        preprocessed: list[PreprocessResult] = []
-        for idx, image_path in enumerate(page_images, start=1):
-            result = self.preprocessor.enhance(image_path, run_dirs["intermediates"], f"page_{idx:03d}")
-            preprocessed.append(result)
-
-        return PreparedDocument(
+        prepared = PreparedDocument(
             original_path=file_path,
             mime_type=mime,
-            page_images=page_images,
-            preprocessed=preprocessed,
+            pages=iter(()),
             converted_files=converted_files,
+            page_count=page_count,
+            native_results=native_results,
+            timings=timings,
+            render_source=render_source,
         )
+        prepared.pages = _prefetch(
+            self._preprocess_pages(page_images, prepared, run_dirs),
+            self.config.prefetch_pages,
+        )
+        return prepared
+
+    def rerender(
+        self,
+        prepared: PreparedDocument,
+        page_numbers: list[int],
+        run_dirs: dict[str, Path],
+    ) -> Iterator[PreprocessResult]:
+        """Preprocess low-confidence pages again from more pixels: PDFs at ``rerender_dpi``,
+        images at their original resolution. Pages already rendered that finely are skipped."""
+        if prepared.render_source is None:
+            return iter(())
+        resolutions = {page.page_number: page.resolution for page in prepared.page_images}
+        numbers = [
+            number for number in page_numbers if RESOLUTION_POLICY.should_rerender(resolutions.get(number))
+        ]
+        if not numbers:
+            return iter(())
+        if prepared.render_source.suffix.lower() == ".pdf":
+            dpi = RESOLUTION_POLICY.config.rerender_dpi
+            pages = self._iter_pdf_pages(
+                prepared.render_source, run_dirs["uploads"], numbers, prepared.timings, dpi=dpi
+            )
+            return self._preprocess_pages(pages, prepared, run_dirs, suffix=f"_{dpi}dpi")
+        with prepared.timings.span("decode"):
+            page = self._load_image(prepared.render_source, fit=False)
+        return self._preprocess_pages(iter([page]), prepared, run_dirs, suffix="_full")
 
 
 DOCUMENT_PROCESSOR = DocumentProcessor()
@@ -1,19 +1,59 @@
 from __future__ import annotations
 
+import copy
 import logging
+import os
+import queue
+import shlex
+import threading
+import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional, Union
 
+import cv2
 import numpy as np
 import pytesseract
 from paddleocr import PaddleOCR
+from paddleocr.tools.infer.predict_system import sorted_boxes
+from paddleocr.tools.infer.utility import get_rotate_crop_image
+from PIL import Image
 from pytesseract import Output
 
 from .config import CONFIG
 
+try:
+    from tesserocr import RIL, PyTessBaseAPI, iterate_level
+except ImportError:  # pragma: no cover - optional dependency
+    PyTessBaseAPI = None
+
 LOGGER = logging.getLogger(__name__)
 
+_WORD_DATA_KEYS = (
+    "level",
+    "page_num",
+    "block_num",
+    "par_num",
+    "line_num",
+    "word_num",
+    "left",
+    "top",
+    "width",
+    "height",
+    "conf",
+    "text",
+)
+
+
+ImageInput = Union[np.ndarray, Path]
+
+MERGED_ENGINE = "merged"
+
+# Detected lines are stacked into one sheet for the Tesseract CLI: one process per page instead of per line
+LINE_SHEET_HEIGHT = 40
+LINE_SHEET_GAP = 16
+
 
 @dataclass
 class OcrEngineResult:
@@ -23,42 +63,304 @@ class OcrEngineResult:
     page_number: Optional[int]
     extra: dict
 
+    @property
+    def score(self) -> Optional[float]:
+        """Confidence normalized to 0..1 (PaddleOCR reports probabilities, the other engines percentages)."""
+        if self.confidence is None:
+            return None
+        return self.confidence if self.engine == "paddleocr" else self.confidence / 100.0
+
+
+def _text_from_word_data(data: dict) -> str:
+    """Rebuild image_to_string-style text (lines, blank line between paragraphs) from TSV data."""
+    paragraphs: list[list[tuple]] = []
+    lines: dict[tuple, list[str]] = {}
+    current_par: Optional[tuple] = None
+    for idx, word in enumerate(data.get("text", [])):
+        word = str(word).strip()
+        if not word:
+            continue
+        par_key = (data["page_num"][idx], data["block_num"][idx], data["par_num"][idx])
+        line_key = par_key + (data["line_num"][idx],)
+        if par_key != current_par:
+            paragraphs.append([])
+            current_par = par_key
+        if line_key not in lines:
+            lines[line_key] = []
+            paragraphs[-1].append(line_key)
+        lines[line_key].append(word)
+    return "\n\n".join(
+        "\n".join(" ".join(lines[line_key]) for line_key in paragraph) for paragraph in paragraphs
+    )
+
+
+def _to_pil(image: ImageInput) -> Image.Image:
+    if isinstance(image, Path):
+        return Image.open(image)
+    if image.ndim == 3:
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return Image.fromarray(image)
+
+
+def _to_bgr(image: ImageInput) -> np.ndarray:
+    if isinstance(image, Path):
+        loaded = cv2.imread(str(image), cv2.IMREAD_COLOR)
+        if loaded is None:
+            raise ValueError(f"Cannot read image: {image}")
+        return loaded
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def _line_sheet(crops: list[np.ndarray]) -> np.ndarray:
+    """Stack line crops, scaled to a common height, top to bottom on a white page."""
+    lines: list[np.ndarray] = []
+    for crop in crops:
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        scale = LINE_SHEET_HEIGHT / max(1, gray.shape[0])
+        width = max(1, int(round(gray.shape[1] * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        lines.append(cv2.resize(gray, (width, LINE_SHEET_HEIGHT), interpolation=interpolation))
+    pitch = LINE_SHEET_HEIGHT + LINE_SHEET_GAP
+    sheet = np.full(
+        (len(lines) * pitch + LINE_SHEET_GAP, max(line.shape[1] for line in lines) + 2 * LINE_SHEET_GAP),
+        255,
+        dtype=np.uint8,
+    )
+    for index, line in enumerate(lines):
+        top = LINE_SHEET_GAP + index * pitch
+        sheet[top : top + LINE_SHEET_HEIGHT, LINE_SHEET_GAP : LINE_SHEET_GAP + line.shape[1]] = line
+    return sheet
+
+
+def _parse_variables(config: str) -> Iterator[tuple[str, str]]:
+    tokens = shlex.split(config or "")
+    for flag, value in zip(tokens, tokens[1:]):
+        if flag == "-c" and "=" in value:
+            key, _, val = value.partition("=")
+            yield key, val
+
 
 class TesseractEngine:
     def __init__(self) -> None:
         self.config = CONFIG.tesseract
+        self._local = threading.local()
+
+    @property
+    def backend(self) -> str:
+        if self.config.backend == "tesserocr" or (self.config.backend == "auto" and PyTessBaseAPI is not None):
+            return "tesserocr"
+        return "cli"
 
-    def run(self, image_path: Path, page_number: Optional[int] = None) -> OcrEngineResult:
+    def _api(self) -> PyTessBaseAPI:
+        # The tesserocr handle is not thread-safe: keep one per thread, reused across pages
+        api = getattr(self._local, "api", None)
+        if api is None:
+            if PyTessBaseAPI is None:
+                raise RuntimeError("OCR_TESS_BACKEND=tesserocr but tesserocr is not installed")
+            LOGGER.info("Loading Tesseract API (lang=%s)", self.config.languages)
+            api = PyTessBaseAPI(lang=self.config.languages, psm=self.config.psm, oem=self.config.oem)
+            for key, value in _parse_variables(self.config.config):
+                api.SetVariable(key, value)
+            self._local.api = api
+        return api
+
+    def _run_api(self, image: ImageInput) -> dict:
+        api = self._api()
+        if isinstance(image, Path):
+            api.SetImageFile(str(image))
+        else:
+            api.SetImage(_to_pil(image))
+        api.Recognize()
+        data: dict[str, list] = {key: [] for key in _WORD_DATA_KEYS}
+        block_num = par_num = line_num = word_num = 0
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        for word in iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block_num += 1
+                par_num = line_num = 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num += 1
+                word_num = 0
+            word_num += 1
+            bbox = word.BoundingBox(RIL.WORD)
+            left, top, right, bottom = bbox if bbox else (0, 0, 0, 0)
+            values = {
+                "level": 5,
+                "page_num": 1,
+                "block_num": block_num,
+                "par_num": par_num,
+                "line_num": line_num,
+                "word_num": word_num,
+                "left": left,
+                "top": top,
+                "width": right - left,
+                "height": bottom - top,
+                "conf": round(word.Confidence(RIL.WORD), 2),
+                "text": word.GetUTF8Text(RIL.WORD) or "",
+            }
+            for key, value in values.items():
+                data[key].append(value)
+        return data
+
+    def _run_cli(self, image: ImageInput) -> dict:
         tess_config = self.config.config or ""
         custom_config = f"--psm {self.config.psm} --oem {self.config.oem} {tess_config}".strip()
-        data = pytesseract.image_to_data(
-            str(image_path),
+        return pytesseract.image_to_data(
+            str(image) if isinstance(image, Path) else _to_pil(image),
             lang=self.config.languages,
             output_type=Output.DICT,
             config=custom_config,
         )
-        text = pytesseract.image_to_string(
-            str(image_path), lang=self.config.languages, config=custom_config
-        )
-        confidences = [int(conf) for conf in data.get("conf", []) if conf and conf != "-1"]
+
+    def run(self, image: ImageInput, page_number: Optional[int] = None) -> OcrEngineResult:
+        # Single recognition pass: the text is rebuilt from the word-level data
+        started = time.perf_counter()
+        data = self._run_api(image) if self.backend == "tesserocr" else self._run_cli(image)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        text = _text_from_word_data(data)
+        confidences = [float(conf) for conf in data.get("conf", []) if conf not in ("", None) and float(conf) >= 0]
         avg_conf = float(np.mean(confidences)) if confidences else None
         return OcrEngineResult(
             text=text,
             confidence=avg_conf,
             engine="tesseract",
             page_number=page_number,
-            extra={"word_data": data},
+            extra={"word_data": data, "elapsed_ms": elapsed_ms},
+        )
+
+    def recognize_line(self, image: np.ndarray, whitelist: Optional[str] = None) -> tuple[str, Optional[float]]:
+        """Recognize a single text line (PSM 7), e.g. a template field crop."""
+        if self.backend == "tesserocr":
+            api = self._api()
+            api.SetPageSegMode(7)
+            if whitelist:
+                api.SetVariable("tessedit_char_whitelist", whitelist)
+            try:
+                api.SetImage(_to_pil(image))
+                text = api.GetUTF8Text() or ""
+                confidences = [float(conf) for conf in api.AllWordConfidences() if conf >= 0]
+            finally:
+                # The handle is reused for full pages: restore the page settings
+                api.SetPageSegMode(self.config.psm)
+                if whitelist:
+                    api.SetVariable("tessedit_char_whitelist", "")
+        else:
+            custom_config = f"--psm 7 --oem {self.config.oem} {self.config.config or ''}".strip()
+            if whitelist:
+                custom_config += f" -c tessedit_char_whitelist={whitelist}"
+            data = pytesseract.image_to_data(
+                _to_pil(image),
+                lang=self.config.languages,
+                output_type=Output.DICT,
+                config=custom_config,
+            )
+            text = _text_from_word_data(data)
+            confidences = [
+                float(conf) for conf in data.get("conf", []) if conf not in ("", None) and float(conf) >= 0
+            ]
+        return text.strip(), float(np.mean(confidences)) if confidences else None
+
+    def detect_orientation(self, image: np.ndarray) -> Optional[tuple[int, float]]:
+        """Tesseract OSD: clockwise degrees that turn the page upright and their confidence, None on failure."""
+        try:
+            osd = pytesseract.image_to_osd(_to_pil(image), output_type=Output.DICT, config="--psm 0")
+        except pytesseract.TesseractError:
+            # Too little text, or osd.traineddata missing
+            return None
+        return int(osd.get("rotate", 0)) % 360, float(osd.get("orientation_conf", 0.0))
+
+    def recognize_lines(self, crops: list[np.ndarray]) -> list[tuple[str, Optional[float]]]:
+        """Recognize detected line crops, skipping Tesseract's own page layout analysis."""
+        if not crops:
+            return []
+        if self.backend == "tesserocr":
+            return [self.recognize_line(crop) for crop in crops]
+        custom_config = f"--psm 6 --oem {self.config.oem} {self.config.config or ''}".strip()
+        data = pytesseract.image_to_data(
+            _to_pil(_line_sheet(crops)),
+            lang=self.config.languages,
+            output_type=Output.DICT,
+            config=custom_config,
         )
+        # Words are mapped back to their line by the vertical band they fall in
+        pitch = LINE_SHEET_HEIGHT + LINE_SHEET_GAP
+        words: list[list[str]] = [[] for _ in crops]
+        confidences: list[list[float]] = [[] for _ in crops]
+        for idx, word in enumerate(data.get("text", [])):
+            word = str(word).strip()
+            conf = data["conf"][idx]
+            if not word or conf in ("", None) or float(conf) < 0:
+                continue
+            center = int(data["top"][idx]) + int(data["height"][idx]) / 2
+            line = min(len(crops) - 1, max(0, int((center - LINE_SHEET_GAP / 2) // pitch)))
+            words[line].append(word)
+            confidences[line].append(float(conf))
+        return [
+            (" ".join(line_words), float(np.mean(line_confs)) if line_confs else None)
+            for line_words, line_confs in zip(words, confidences)
+        ]
+
+
+class PaddleBatcher:
+    """Collect pages from concurrent callers into micro-batches for a single inference thread."""
+
+    def __init__(self, infer: Callable[[list[np.ndarray]], list[list]], batch_size: int, max_wait_ms: int) -> None:
+        self._infer = infer
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[tuple[np.ndarray, Future]] = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="paddle-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image: np.ndarray) -> Future:
+        future: Future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                outputs = self._infer([image for image, _ in batch])
+            except Exception as exc:  # noqa: BLE001
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
 
 
 class PaddleEngine:
     def __init__(self) -> None:
         self.config = CONFIG.paddle
         self._ocr: Optional[PaddleOCR] = None
+        # The Paddle predictors are not thread-safe: all inference goes through this lock
+        self._lock = threading.Lock()
+        self._batcher: Optional[PaddleBatcher] = None
+        self._batcher_pid: Optional[int] = None
+        self._batcher_lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
 
     def _load(self) -> PaddleOCR:
         if self._ocr is None:
             LOGGER.info("Loading PaddleOCR (lang=%s, gpu=%s)", self.config.lang, self.config.use_gpu)
+            started = time.perf_counter()
             self._ocr = PaddleOCR(
                 use_angle_cls=self.config.use_angle_cls,
                 lang=self.config.lang,
@@ -67,18 +369,82 @@ class PaddleEngine:
                 det_model_dir=self.config.det_model_dir,
                 rec_model_dir=self.config.rec_model_dir,
                 cpu_threads=self.config.cpu_threads,
+                rec_batch_num=self.config.rec_batch_num,
             )
+            self.load_seconds = time.perf_counter() - started
         return self._ocr
 
-    def run(self, image_path: Path, page_number: Optional[int] = None) -> OcrEngineResult:
-        ocr = self._load()
-        result = ocr.ocr(str(image_path), det=True, rec=True, cls=True)
-        lines = []
-        confidences = []
-        for line in result:
-            for _, (text, conf) in line:
-                lines.append(text)
-                confidences.append(conf)
+    def preload(self) -> None:
+        with self._lock:
+            self._load()
+
+    def _get_batcher(self) -> PaddleBatcher:
+        # Threads do not survive a fork: every pool worker starts its own batcher
+        with self._batcher_lock:
+            if self._batcher is None or self._batcher_pid != os.getpid():
+                self._batcher = PaddleBatcher(self.infer_batch, self.config.batch_size, self.config.batch_wait_ms)
+                self._batcher_pid = os.getpid()
+            return self._batcher
+
+    def infer_batch(self, images: list[np.ndarray]) -> list[list]:
+        """Detect every page, then classify and recognize all text crops of the batch together."""
+        with self._lock:
+            ocr = self._load()
+            boxes: list[tuple[int, np.ndarray]] = []
+            crops: list[np.ndarray] = []
+            for index, image in enumerate(images):
+                dt_boxes, _ = ocr.text_detector(image)
+                if dt_boxes is None or len(dt_boxes) == 0:
+                    continue
+                for box in sorted_boxes(dt_boxes):
+                    boxes.append((index, box))
+                    crops.append(get_rotate_crop_image(image, copy.deepcopy(box)))
+
+            pages: list[list] = [[] for _ in images]
+            if not crops:
+                return pages
+            if self.config.use_angle_cls:
+                crops, _, _ = ocr.text_classifier(crops)
+            rec_res, _ = ocr.text_recognizer(crops)
+            for (index, box), (text, score) in zip(boxes, rec_res):
+                if score >= ocr.drop_score:
+                    pages[index].append([box.tolist(), (text, float(score))])
+            return pages
+
+    def detect_lines(self, image: ImageInput) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        """Text line boxes in reading order and their upright crops (angle classifier applied when enabled)."""
+        bgr = _to_bgr(image)
+        with self._lock:
+            ocr = self._load()
+            dt_boxes, _ = ocr.text_detector(bgr)
+            if dt_boxes is None or len(dt_boxes) == 0:
+                return [], []
+            boxes = list(sorted_boxes(dt_boxes))
+            crops = [get_rotate_crop_image(bgr, copy.deepcopy(box)) for box in boxes]
+            if self.config.use_angle_cls:
+                crops, _, _ = ocr.text_classifier(crops)
+        return boxes, crops
+
+    def recognize_crops(self, crops: list[np.ndarray]) -> list[tuple[str, float]]:
+        """Recognition only, no detection: for crops that already hold a single upright text line."""
+        if not crops:
+            return []
+        with self._lock:
+            ocr = self._load()
+            rec_res, _ = ocr.text_recognizer([_to_bgr(crop) for crop in crops])
+        return [(text, float(score)) for text, score in rec_res]
+
+    def run(self, image: ImageInput, page_number: Optional[int] = None) -> OcrEngineResult:
+        started = time.perf_counter()
+        bgr = _to_bgr(image)
+        if self.config.batch_size > 1:
+            page = self._get_batcher().submit(bgr).result()
+        else:
+            page = self.infer_batch([bgr])[0]
+        # Includes the wait for a micro-batch slot and the inference lock
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        lines = [text for _, (text, _) in page]
+        confidences = [conf for _, (_, conf) in page]
         text = "\n".join(lines)
         avg_conf = float(np.mean(confidences)) if confidences else None
         return OcrEngineResult(
@@ -86,9 +452,68 @@ class PaddleEngine:
             confidence=avg_conf,
             engine="paddleocr",
             page_number=page_number,
-            extra={"raw": result},
+            extra={"raw": [page], "elapsed_ms": elapsed_ms},
         )
 
 
+def merge_line_results(
+    page_number: Optional[int],
+    boxes: list[np.ndarray],
+    tess_lines: list[tuple[str, Optional[float]]],
+    paddle_lines: list[tuple[str, float]],
+    elapsed_ms: dict[str, float],
+) -> list[OcrEngineResult]:
+    """Both engines' readings of the same detected lines, plus a ``merged`` result that keeps
+    the more confident reading of every line."""
+    tess_entries: list[dict] = []
+    raw: list = []
+    merged: list[dict] = []
+    for box, (tess_text, tess_conf), (paddle_text, paddle_score) in zip(boxes, tess_lines, paddle_lines):
+        points = np.asarray(box).tolist()
+        tess_entries.append({"box": points, "text": tess_text, "confidence": tess_conf})
+        raw.append([points, (paddle_text, paddle_score)])
+        tess_score = (tess_conf or 0.0) / 100.0 if tess_text else 0.0
+        paddle_score = paddle_score if paddle_text else 0.0
+        if tess_score > paddle_score:
+            merged.append(
+                {"box": points, "text": tess_text, "confidence": tess_score * 100, "engine": "tesseract"}
+            )
+        elif paddle_text:
+            merged.append(
+                {"box": points, "text": paddle_text, "confidence": paddle_score * 100, "engine": "paddleocr"}
+            )
+
+    def mean(values: list[Optional[float]]) -> Optional[float]:
+        values = [value for value in values if value is not None]
+        return float(np.mean(values)) if values else None
+
+    line_engines: dict[str, int] = {}
+    for line in merged:
+        line_engines[line["engine"]] = line_engines.get(line["engine"], 0) + 1
+    return [
+        OcrEngineResult(
+            text="\n".join(entry["text"] for entry in tess_entries if entry["text"]),
+            confidence=mean([entry["confidence"] for entry in tess_entries if entry["text"]]),
+            engine="tesseract",
+            page_number=page_number,
+            extra={"lines": tess_entries, "detection": "shared", "elapsed_ms": elapsed_ms["tesseract"]},
+        ),
+        OcrEngineResult(
+            text="\n".join(text for _, (text, _) in raw if text),
+            confidence=mean([score for _, (text, score) in raw if text]),
+            engine="paddleocr",
+            page_number=page_number,
+            extra={"raw": [raw], "detection": "shared", "elapsed_ms": elapsed_ms["paddleocr"]},
+        ),
+        OcrEngineResult(
+            text="\n".join(line["text"] for line in merged),
+            confidence=mean([line["confidence"] for line in merged]),
+            engine=MERGED_ENGINE,
+            page_number=page_number,
+            extra={"lines": merged, "line_engines": line_engines},
+        ),
+    ]
+
+
 TESSERACT_ENGINE = TesseractEngine()
 PADDLE_ENGINE = PaddleEngine()
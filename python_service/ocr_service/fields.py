@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .config import CONFIG
+from .engines import OcrEngineResult, PADDLE_ENGINE, TESSERACT_ENGINE
+from .metrics import RunTimings
+from .preprocess import PREPROCESSOR
+from .templates import DocumentTemplate, FieldTemplate, TemplateSelection
+
+LOGGER = logging.getLogger(__name__)
+
+# Card contours must cover at least this share of the (downscaled) photo
+MIN_CARD_AREA = 0.2
+LOCATE_MAX_SIDE = 800
+
+
+@dataclass
+class FieldCrop:
+    spec: FieldTemplate
+    box: tuple[int, int, int, int]
+    gray: np.ndarray
+    binary: np.ndarray
+
+
+@dataclass
+class FieldResult:
+    name: str
+    value: str
+    score: Optional[float]
+    engine: Optional[str]
+    valid: bool
+    box: tuple[int, int, int, int]
+    candidates: list[OcrEngineResult] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "value": self.value,
+            "confidence": round(self.score, 4) if self.score is not None else None,
+            "engine": self.engine,
+            "valid": self.valid,
+            "box": list(self.box),
+        }
+
+
+def _order_corners(points: np.ndarray) -> np.ndarray:
+    # Top-left has the smallest x+y, bottom-right the largest; y-x separates the other two
+    points = points.reshape(4, 2).astype(np.float32)
+    total = points.sum(axis=1)
+    diff = np.diff(points, axis=1).ravel()
+    return np.array(
+        [points[np.argmin(total)], points[np.argmin(diff)], points[np.argmax(total)], points[np.argmax(diff)]],
+        dtype=np.float32,
+    )
+
+
+class FieldExtractor:
+    """Template-driven OCR: locate the card, crop the field regions and recognize only those."""
+
+    def __init__(self) -> None:
+        self.config = CONFIG.templates
+
+    def locate_card(self, image: np.ndarray, template: DocumentTemplate) -> tuple[np.ndarray, bool]:
+        """Warp the largest quadrilateral to the template's canonical card size.
+
+        Falls back to the whole image (already a tight crop or scan) when no card outline is found.
+        """
+        width = template.card_width
+        height = int(round(width / template.aspect_ratio))
+        scale = min(1.0, LOCATE_MAX_SIDE / max(image.shape[:2]))
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+        edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = MIN_CARD_AREA * gray.shape[0] * gray.shape[1]
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+            if cv2.contourArea(contour) < min_area:
+                break
+            approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+            if len(approx) != 4:
+                continue
+            corners = _order_corners(approx) / scale
+            target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+            matrix = cv2.getPerspectiveTransform(corners, target)
+            return cv2.warpPerspective(image, matrix, (width, height)), True
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA), False
+
+    def crop_fields(self, card: np.ndarray, fields: list[FieldTemplate]) -> list[FieldCrop]:
+        card_height, card_width = card.shape[:2]
+        crops: list[FieldCrop] = []
+        for spec in fields:
+            x, y, w, h = spec.region
+            left = max(0, int(x * card_width))
+            top = max(0, int(y * card_height))
+            right = min(card_width, int((x + w) * card_width))
+            bottom = min(card_height, int((y + h) * card_height))
+            if right <= left or bottom <= top:
+                LOGGER.warning("Empty region for field %s", spec.name)
+                continue
+            gray, binary = PREPROCESSOR.enhance_region(card[top:bottom, left:right], self.config.field_height)
+            box = (left, top, right - left, bottom - top)
+            crops.append(FieldCrop(spec=spec, box=box, gray=gray, binary=binary))
+        return crops
+
+    def _tesseract(self, crops: list[FieldCrop], timings: RunTimings) -> dict[str, OcrEngineResult]:
+        results: dict[str, OcrEngineResult] = {}
+        with timings.span("tesseract"):
+            for crop in crops:
+                text, confidence = TESSERACT_ENGINE.recognize_line(crop.binary, whitelist=crop.spec.whitelist)
+                results[crop.spec.name] = OcrEngineResult(
+                    text=text, confidence=confidence, engine="tesseract", page_number=1, extra={}
+                )
+        return results
+
+    def _paddle(self, crops: list[FieldCrop], timings: RunTimings) -> dict[str, OcrEngineResult]:
+        if not crops:
+            return {}
+        # All fields go through the recognizer as one batch, detection is skipped entirely
+        with timings.span("paddleocr"):
+            outputs = PADDLE_ENGINE.recognize_crops([crop.gray for crop in crops])
+        return {
+            crop.spec.name: OcrEngineResult(
+                text=text, confidence=score, engine="paddleocr", page_number=1, extra={}
+            )
+            for crop, (text, score) in zip(crops, outputs)
+        }
+
+    @staticmethod
+    def _pick(crop: FieldCrop, candidates: list[OcrEngineResult]) -> FieldResult:
+        best: Optional[FieldResult] = None
+        for candidate in candidates:
+            value = crop.spec.clean(candidate.text)
+            option = FieldResult(
+                name=crop.spec.name,
+                value=value,
+                score=candidate.score,
+                engine=candidate.engine,
+                valid=crop.spec.is_valid(value),
+                box=crop.box,
+                candidates=candidates,
+            )
+            # A value matching the template pattern beats a more confident one that does not
+            if best is None or (option.valid, option.score or 0.0) > (best.valid, best.score or 0.0):
+                best = option
+        if best is None:
+            return FieldResult(crop.spec.name, "", None, None, False, crop.box, candidates)
+        return best
+
+    def extract(
+        self,
+        image: np.ndarray,
+        selection: TemplateSelection,
+        mode: str,
+        timings: RunTimings,
+    ) -> tuple[list[FieldResult], np.ndarray, bool]:
+        """Recognize the selected fields; returns the field results, the card image and whether it was located."""
+        with timings.span("locate"):
+            card, located = self.locate_card(image, selection.template)
+        with timings.span("crop"):
+            crops = self.crop_fields(card, selection.fields)
+
+        candidates: dict[str, list[OcrEngineResult]] = {crop.spec.name: [] for crop in crops}
+        if mode in ("fast", "auto", "cascade"):
+            for name, result in self._tesseract(crops, timings).items():
+                candidates[name].append(result)
+        if mode in ("enhanced", "auto"):
+            paddle_crops = crops
+        elif mode == "cascade":
+            # Escalate only the fields Tesseract could not read with confidence
+            threshold = CONFIG.cascade.min_confidence / 100.0
+            paddle_crops = []
+            for crop in crops:
+                current = self._pick(crop, candidates[crop.spec.name])
+                if not current.valid or (current.score or 0.0) < threshold:
+                    paddle_crops.append(crop)
+        else:
+            paddle_crops = []
+        for name, result in self._paddle(paddle_crops, timings).items():
+            candidates[name].append(result)
+
+        return [self._pick(crop, candidates[crop.spec.name]) for crop in crops], card, located
+
+
+FIELD_EXTRACTOR = FieldExtractor()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+
+from .config import CONFIG
+from .parallel import PAGE_POOL
+from .service import SERVICE, OcrMode, OcrService
+from .storage import UploadSource
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Bounded queue of OCR runs drained by a fixed pool of worker threads.
+
+    Each queue entry is a list of run ids: a single upload or a whole batch.
+    """
+
+    def __init__(self, service: OcrService) -> None:
+        self.config = CONFIG.queue
+        self.service = service
+        self._queue: queue.Queue[list[int]] = queue.Queue(maxsize=max(1, self.config.max_queue_size))
+        self._workers: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def capacity(self) -> int:
+        return self._queue.maxsize
+
+    def start(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            for idx in range(max(1, self.config.workers)):
+                worker = threading.Thread(target=self._work, name=f"ocr-worker-{idx}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            LOGGER.info("Started %d OCR workers (queue size %d)", len(self._workers), self.capacity)
+
+    def recover(self) -> None:
+        """Put runs interrupted by a restart or crash back on the queue (call before serving requests)."""
+        for run_id in self.service.recover_interrupted_runs():
+            try:
+                self._queue.put_nowait([run_id])
+            except queue.Full:
+                self.service.mark_failed(run_id, "Interrupted by a service restart, OCR queue is full")
+
+    def _enqueue(self, run_ids: list[int]) -> None:
+        try:
+            self._queue.put_nowait(run_ids)
+        except queue.Full as exc:
+            for run_id in run_ids:
+                self.service.mark_failed(run_id, "OCR queue is full")
+            raise HTTPException(status_code=429, detail="OCR queue is full, retry later") from exc
+
+    def submit(
+        self,
+        source: UploadSource,
+        filename: str,
+        mode: OcrMode = "auto",
+        doc_type: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ) -> int:
+        if self._queue.full():
+            raise HTTPException(status_code=429, detail="OCR queue is full, retry later")
+        self.start()
+
+        run_id = self.service.create_run(
+            source, filename, mode=mode, status="queued", doc_type=doc_type, sampler=sampler
+        )
+        self._enqueue([run_id])
+        return run_id
+
+    def submit_batch(
+        self,
+        uploads: Iterable[tuple[str, UploadSource]],
+        mode: OcrMode = "auto",
+        doc_type: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ) -> tuple[int, list[int]]:
+        if self._queue.full():
+            raise HTTPException(status_code=429, detail="OCR queue is full, retry later")
+        self.start()
+
+        batch_id, run_ids = self.service.create_batch(uploads, mode=mode, doc_type=doc_type, sampler=sampler)
+        if run_ids:
+            self._enqueue(run_ids)
+        return batch_id, run_ids
+
+    def _execute(self, run_id: int) -> None:
+        try:
+            self.service.execute(run_id)
+        except Exception:  # noqa: BLE001
+            # execute() already logged the traceback and marked the run as failed
+            LOGGER.warning("Queued OCR run %s failed", run_id)
+
+    def _work(self) -> None:
+        while True:
+            run_ids = self._queue.get()
+            try:
+                if len(run_ids) == 1:
+                    self._execute(run_ids[0])
+                else:
+                    # Documents of a batch run side by side so their pages share the page pool
+                    # and PaddleOCR micro-batches instead of draining one document at a time
+                    with ThreadPoolExecutor(
+                        max_workers=min(len(run_ids), PAGE_POOL.concurrency),
+                        thread_name_prefix="ocr-batch",
+                    ) as executor:
+                        list(executor.map(self._execute, run_ids))
+            finally:
+                self._queue.task_done()
+
+
+JOB_QUEUE = JobQueue(SERVICE)
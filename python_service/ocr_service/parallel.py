@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from .cache import RESULT_CACHE
+from .config import CONFIG
+from .engines import OcrEngineResult, PADDLE_ENGINE, TESSERACT_ENGINE, merge_line_results
+from .metrics import RunTimings
+
+LOGGER = logging.getLogger(__name__)
+
+# Page cache entries of a run are written together, in one transaction per this many pages
+CACHE_FLUSH_PAGES = 32
+
+
+def _init_worker(paddle_threads: int, warmup_image: Optional[np.ndarray]) -> None:
+    # Runs once in every worker, before it takes a page: engines are module singletons, so each
+    # process loads (and warms up) its own PaddleOCR instance for the lifetime of the pool.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    CONFIG.paddle.cpu_threads = paddle_threads
+    # A worker holds one page at a time, so its batcher would only ever wait out batch_wait_ms alone
+    CONFIG.paddle.batch_size = 1
+    PADDLE_ENGINE.preload()
+    if warmup_image is not None:
+        recognize_page(warmup_image, 0, "auto")
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _timed(func, *args) -> tuple[list, float]:
+    started = time.perf_counter()
+    output = func(*args)
+    return output, (time.perf_counter() - started) * 1000
+
+
+def _recognize_shared(image: np.ndarray, page_number: int) -> list[OcrEngineResult]:
+    # Layout work happens once: Tesseract reads the detected lines instead of segmenting the page itself
+    (boxes, crops), detect_ms = _timed(PADDLE_ENGINE.detect_lines, image)
+    with ThreadPoolExecutor(max_workers=2) as engines:
+        tess_future = engines.submit(_timed, TESSERACT_ENGINE.recognize_lines, crops)
+        paddle_future = engines.submit(_timed, PADDLE_ENGINE.recognize_crops, crops)
+        tess_lines, tess_ms = tess_future.result()
+        paddle_lines, paddle_ms = paddle_future.result()
+    elapsed_ms = {"tesseract": round(tess_ms, 2), "paddleocr": round(detect_ms + paddle_ms, 2)}
+    return merge_line_results(page_number, boxes, tess_lines, paddle_lines, elapsed_ms)
+
+
+def recognize_page(image: np.ndarray, page_number: int, mode: str) -> list[OcrEngineResult]:
+    if mode == "fast":
+        return [TESSERACT_ENGINE.run(image, page_number=page_number)]
+    if mode == "enhanced":
+        return [PADDLE_ENGINE.run(image, page_number=page_number)]
+    if mode == "cascade":
+        # Early exit: PaddleOCR only runs when Tesseract is not confident enough
+        tess_result = TESSERACT_ENGINE.run(image, page_number=page_number)
+        if tess_result.score is not None and tess_result.score * 100 >= CONFIG.cascade.min_confidence:
+            return [tess_result]
+        return [tess_result, PADDLE_ENGINE.run(image, page_number=page_number)]
+
+    if CONFIG.pipeline.shared_detection:
+        return _recognize_shared(image, page_number)
+
+    # Auto mode: both engines release the GIL, so they overlap on the same page
+    with ThreadPoolExecutor(max_workers=2) as engines:
+        tess_future = engines.submit(TESSERACT_ENGINE.run, image, page_number)
+        paddle_future = engines.submit(PADDLE_ENGINE.run, image, page_number)
+        return [tess_future.result(), paddle_future.result()]
+
+
+class PagePool:
+    """Fan pages out to a shared process pool and yield their results in page order.
+
+    Workers come from a forkserver, not a fork of this process: the pool is created (and
+    re-created after a crash) from warmup or queue threads, and a forked child could inherit
+    locks held by other threads. With a single worker process, pages still run on a small
+    thread pool so that concurrent pages can share PaddleOCR micro-batches; worker processes
+    call PaddleOCR directly since they never have a second page to batch with.
+    """
+
+    def __init__(self) -> None:
+        self.config = CONFIG.parallel
+        self._executor: Optional[Executor] = None
+        self._warmup_image: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        return max(1, self.config.page_workers)
+
+    @property
+    def concurrency(self) -> int:
+        return self.workers if self.workers > 1 else max(1, self.config.page_threads)
+
+    @property
+    def paddle_threads(self) -> int:
+        budget = max(1, self.config.max_cpu_threads // self.workers)
+        return max(1, min(CONFIG.paddle.cpu_threads, budget))
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.concurrency <= 1:
+            return None
+        with self._lock:
+            if self._executor is None and self.workers <= 1:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ocr-page")
+            elif self._executor is None:
+                LOGGER.info(
+                    "Starting page pool with %d workers (%d Paddle threads each)",
+                    self.workers,
+                    self.paddle_threads,
+                )
+                context = multiprocessing.get_context("forkserver")
+                # The fork server imports the engines once; workers fork from it and only load the models
+                context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.paddle_threads, self._warmup_image),
+                )
+            return self._executor
+
+    def _discard(self, executor: Executor) -> None:
+        # A worker died (OOM kill, native crash): the pool refuses new work, so the next call starts a fresh one
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        LOGGER.warning("Page pool is broken, restarting it")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, image: np.ndarray, page_number: int, mode: str) -> tuple[Executor, Future]:
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(recognize_page, image, page_number, mode)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(recognize_page, image, page_number, mode)
+
+    def start(self, warmup_image: Optional[np.ndarray] = None) -> None:
+        """Start the workers now instead of on the first page.
+
+        With worker processes, ``warmup_image`` is recognized by the initializer of every process
+        (also those started after a crash), so no page reaches a cold worker. The call returns once
+        ``workers`` no-op jobs were served, which does not prove every process is up yet.
+        Without worker processes the current process is warmed up instead.
+        """
+        self._warmup_image = warmup_image
+        executor = self._get_executor()
+        if executor is None or self.workers <= 1:
+            if warmup_image is not None:
+                recognize_page(warmup_image, 0, "auto")
+            return
+        futures = [executor.submit(_worker_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def _lookup(self, image: np.ndarray, mode: str) -> tuple[Optional[str], Optional[list[OcrEngineResult]]]:
+        if not RESULT_CACHE.enabled:
+            return None, None
+        key = RESULT_CACHE.page_key(image, mode)
+        return key, RESULT_CACHE.get_page(key)
+
+    def map(
+        self,
+        pages: Iterable[tuple[int, np.ndarray]],
+        mode: str,
+        timings: Optional[RunTimings] = None,
+    ) -> Iterator[list[OcrEngineResult]]:
+        """Consume ``(page_number, image)`` lazily, keeping a bounded number of pages in flight.
+
+        Engine durations are reported by the engines themselves (``extra["elapsed_ms"]``) so
+        they survive the trip back from worker processes; cached pages are not counted.
+        """
+        executor = self._get_executor()
+        in_flight = self.concurrency * 2
+        # (cache key, page number, fresh, future, image and executor kept for a retry on a broken pool)
+        pending: deque[tuple[Optional[str], int, bool, Future, Optional[np.ndarray], Optional[Executor]]] = deque()
+        to_cache: list[tuple[str, list[OcrEngineResult]]] = []
+
+        def collect() -> list[OcrEngineResult]:
+            key, page_number, fresh, future, image, owner = pending.popleft()
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                # Pages in flight when a worker died are retried once on a new pool; a page that
+                # kills its worker again fails the run
+                self._discard(owner)
+                results = self._get_executor().submit(recognize_page, image, page_number, mode).result()
+            if key is not None:
+                to_cache.append((key, results))
+                if len(to_cache) >= CACHE_FLUSH_PAGES:
+                    RESULT_CACHE.put_pages(to_cache)
+                    to_cache.clear()
+            for result in results:
+                result.page_number = page_number
+                if fresh and timings is not None and "elapsed_ms" in result.extra:
+                    timings.add(result.engine, result.extra["elapsed_ms"] / 1000)
+            return results
+
+        try:
+            for page_number, image in pages:
+                key, cached = self._lookup(image, mode)
+                future: Future = Future()
+                owner: Optional[Executor] = None
+                if cached is not None:
+                    future.set_result(cached)
+                    key = None
+                elif executor is None:
+                    future.set_result(recognize_page(image, page_number, mode))
+                else:
+                    owner, future = self._submit(image, page_number, mode)
+                pending.append((key, page_number, cached is None, future, image if owner else None, owner))
+                if len(pending) >= in_flight or executor is None:
+                    yield collect()
+            while pending:
+                yield collect()
+        finally:
+            for *_, future, _, _ in pending:
+                future.cancel()
+            RESULT_CACHE.put_pages(to_cache)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+PAGE_POOL = PagePool()
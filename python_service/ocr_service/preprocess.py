@@ -1,63 +1,390 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
+
 import cv2
 import numpy as np
-from PIL import Image
+
+from .config import CONFIG
+from .engines import TESSERACT_ENGINE
+from .resolution import Resolution
+
+
+@dataclass
+class PageImage:
+    page_number: int
+    image: Optional[np.ndarray]
+    source: str
+    path: Optional[Path] = None
+    resolution: Optional[Resolution] = None
 
 
 @dataclass
 class PreprocessResult:
-    original_path: Path
-    processed_path: Path
+    page_number: int
+    image: Optional[np.ndarray]
     steps: list[str]
+    original_path: Optional[Path] = None
+    processed_path: Optional[Path] = None
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    details: dict = field(default_factory=dict)
+
+    def metadata(self) -> dict:
+        return {"steps": self.steps, "timings_ms": self.timings_ms, **self.details}
+
+
+@dataclass
+class QualityProbe:
+    noise_sigma: float
+    contrast: float
+    # Skew (degrees) of the page as received, from the orientation stage; None when it did not run
+    skew: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        data = {"noise_sigma": round(self.noise_sigma, 2), "contrast": round(self.contrast, 2)}
+        if self.skew is not None:
+            data["skew"] = round(self.skew, 2)
+        return data
+
+
+@dataclass
+class Orientation:
+    # Clockwise quarter turn applied first, then the residual skew (degrees, counter-clockwise)
+    rotation: int = 0
+    skew: float = 0.0
+    method: str = "projection"
+
+    def as_dict(self) -> dict:
+        return {"rotation": self.rotation, "skew": round(self.skew, 2), "method": self.method}
+
+
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+_SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+
+# Orientation is estimated on a small copy; OSD needs more pixels to read glyphs
+ORIENT_MAX_SIDE = 1000
+OSD_MAX_SIDE = 2000
+ORIENT_MAX_POINTS = 40000
+MIN_TEXT_POINTS = 300
+# Column profile this much sharper than the row profile: the text runs vertically (and the reverse:
+# horizontally); in between, e.g. on sparse or ragged pages, the direction is left to OSD
+VERTICAL_RATIO = 1.3
+# Ink above vs below the x-height band of each line; Latin/Vietnamese text is top-heavy when upright
+UPSIDE_DOWN_RATIO = 1.25
+OSD_MIN_CONFIDENCE = 1.5
+_QUARTER_TURNS = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def _downscale(gray: np.ndarray, max_side: int) -> np.ndarray:
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    if scale >= 1.0:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def _text_points(mask: np.ndarray) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    ys, xs = np.nonzero(mask)
+    if len(xs) < MIN_TEXT_POINTS:
+        return None
+    if len(xs) > ORIENT_MAX_POINTS:
+        pick = np.random.default_rng(0).choice(len(xs), ORIENT_MAX_POINTS, replace=False)
+        xs, ys = xs[pick], ys[pick]
+    return xs.astype(np.float32), ys.astype(np.float32)
+
+
+def _profile_sharpness(xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+    # Ink projected across lines running at ``angle``: well-separated lines give a peaky histogram
+    theta = np.deg2rad(angle)
+    projection = ys * np.cos(theta) - xs * np.sin(theta)
+    hist = np.bincount((projection - projection.min()).astype(np.int64))
+    return float(np.square(hist, dtype=np.float64).sum())
+
+
+def _line_structure(xs: np.ndarray, ys: np.ndarray, angle: float) -> float:
+    # Sharpness relative to the same ink spread evenly over the profile (1.0): comparable between
+    # the row and column profiles whatever the page aspect ratio and margins
+    theta = np.deg2rad(angle)
+    projection = ys * np.cos(theta) - xs * np.sin(theta)
+    bins = int(projection.max() - projection.min()) + 1
+    return _profile_sharpness(xs, ys, angle) * bins / float(len(xs)) ** 2
+
+
+def _best_angle(xs: np.ndarray, ys: np.ndarray, max_angle: float) -> tuple[float, float]:
+    """Coarse-to-fine search for the text line angle; returns ``(angle, line structure at that angle)``."""
+    coarse = np.arange(-max_angle, max_angle + 0.5, 1.0)
+    scores = [_profile_sharpness(xs, ys, angle) for angle in coarse]
+    center = float(coarse[int(np.argmax(scores))])
+    fine = np.arange(center - 1.0, center + 1.05, 0.1)
+    scores = [_profile_sharpness(xs, ys, angle) for angle in fine]
+    angle = float(fine[int(np.argmax(scores))])
+    return angle, _line_structure(xs, ys, angle)
+
+
+def _rotate(image: np.ndarray, angle: float, border: int) -> np.ndarray:
+    """Rotate counter-clockwise by ``angle`` degrees, growing the canvas so no corner is cut off."""
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width = int(round(height * sin + width * cos))
+    new_height = int(round(height * cos + width * sin))
+    matrix[0, 2] += new_width / 2 - width / 2
+    matrix[1, 2] += new_height / 2 - height / 2
+    return cv2.warpAffine(
+        image, matrix, (new_width, new_height), flags=cv2.INTER_LINEAR, borderValue=border
+    )
+
+
+def _ascender_ratio(mask: np.ndarray) -> Optional[float]:
+    """Ink above the x-height band of every line divided by the ink below it, None without lines."""
+    rows = mask.sum(axis=1).astype(np.float64)
+    if rows.max() <= 0:
+        return None
+    ink = (rows > rows.max() * 0.05).astype(np.uint8).reshape(-1, 1)
+    # Close 1-2 row gaps so diacritics stay attached to their line
+    ink = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, np.ones((3, 1), np.uint8)).ravel() > 0
+    above = below = 0.0
+    start = None
+    for index, value in enumerate(np.append(ink, False)):
+        if value and start is None:
+            start = index
+        elif not value and start is not None:
+            band = rows[start:index]
+            start = None
+            if len(band) < 4:
+                continue
+            core = np.nonzero(band >= band.max() * 0.5)[0]
+            above += band[: core[0]].sum()
+            below += band[core[-1] + 1 :].sum()
+    if above + below <= 0:
+        return None
+    return above / max(below, 1.0)
 
 
 class ImagePreprocessor:
-    """Apply a sequence of preprocessing steps tuned for OCR."""
+    """Apply a sequence of preprocessing steps tuned for OCR.
+
+    Cheap quality probes (noise, contrast, skew) decide which of the configured steps
+    are worth running on a page; every step records its duration.
+    """
+
+    def __init__(self) -> None:
+        self.config = CONFIG.preprocess
+
+    @staticmethod
+    def _grayscale(image: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    def probe(self, gray: np.ndarray) -> QualityProbe:
+        # Immerkaer's fast noise variance estimate on the Laplacian-like residual
+        height, width = gray.shape[:2]
+        residual = cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL)
+        area = max(1, (width - 2) * (height - 2))
+        noise_sigma = float(np.abs(residual).sum() * np.sqrt(0.5 * np.pi) / (6.0 * area))
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        cumulative = np.cumsum(hist) / max(1.0, float(hist.sum()))
+        low = int(np.searchsorted(cumulative, 0.02))
+        high = int(np.searchsorted(cumulative, 0.98))
+        return QualityProbe(noise_sigma=noise_sigma, contrast=float(high - low))
+
+    @staticmethod
+    def _osd_rotation(gray: np.ndarray, rotation: int = 0) -> Optional[int]:
+        """Clockwise turn Tesseract OSD reads on the page turned by ``rotation``; None when unsure."""
+        page = _downscale(gray, OSD_MAX_SIDE)
+        if rotation in _QUARTER_TURNS:
+            page = cv2.rotate(page, _QUARTER_TURNS[rotation])
+        osd = TESSERACT_ENGINE.detect_orientation(page)
+        if osd is None or osd[1] < OSD_MIN_CONFIDENCE:
+            return None
+        return osd[0]
+
+    def estimate_orientation(self, gray: np.ndarray) -> Optional[Orientation]:
+        """Quarter turn and residual skew that make the page upright.
+
+        None when there is too little ink, or when neither the line profiles nor OSD can tell
+        which way the text runs: the page is then left as it is.
+        """
+        method = self.config.orientation
+        _, mask = cv2.threshold(_downscale(gray, ORIENT_MAX_SIDE), 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        points = _text_points(mask)
+        if points is None:
+            return None
 
-    def enhance(self, image_path: Path, output_dir: Path, prefix: str) -> PreprocessResult:
-        image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
-        if image is None:
-            raise ValueError(f"Cannot read image: {image_path}")
+        if method == "osd":
+            orientation = Orientation(rotation=self._osd_rotation(gray) or 0, method="osd")
+        else:
+            _, row_score = _best_angle(*points, self.config.max_skew)
+            _, column_score = _best_angle(points[1], points[0], self.config.max_skew)
+            ratio = column_score / max(row_score, 1e-9)
+            if 1 / VERTICAL_RATIO < ratio < VERTICAL_RATIO:
+                rotation = self._osd_rotation(gray) if method == "auto" else None
+                if rotation is None:
+                    return None
+                orientation = Orientation(rotation=rotation, method="osd")
+            else:
+                # Which way round is settled by the upside-down check below
+                orientation = Orientation(rotation=90 if ratio >= VERTICAL_RATIO else 0)
+        if orientation.rotation in _QUARTER_TURNS:
+            mask = cv2.rotate(mask, _QUARTER_TURNS[orientation.rotation])
+            points = _text_points(mask) or points
+        orientation.skew, _ = _best_angle(*points, self.config.max_skew)
 
+        if orientation.method == "projection":
+            # Only meaningful once the lines are known to run horizontally on the turned page
+            ratio = _ascender_ratio(_rotate(mask, orientation.skew, 0))
+            upside_down = ratio is not None and ratio < 1 / UPSIDE_DOWN_RATIO
+            if method == "auto" and (ratio is None or 1 / UPSIDE_DOWN_RATIO <= ratio < UPSIDE_DOWN_RATIO):
+                # Too close to call from the ascenders: ask Tesseract OSD on the turned page
+                turn = self._osd_rotation(gray, orientation.rotation)
+                if turn is not None:
+                    orientation.method = "osd"
+                    upside_down = turn == 180
+            if upside_down:
+                orientation.rotation = (orientation.rotation + 180) % 360
+        return orientation
+
+    def _apply_orientation(self, gray: np.ndarray, orientation: Orientation) -> np.ndarray:
+        if orientation.rotation in _QUARTER_TURNS:
+            gray = cv2.rotate(gray, _QUARTER_TURNS[orientation.rotation])
+        if abs(orientation.skew) >= self.config.min_skew:
+            gray = _rotate(gray, orientation.skew, 255)
+        return gray
+
+    def _choose_denoiser(self, probe: QualityProbe) -> Optional[str]:
+        method = self.config.denoiser
+        if "denoise" not in self.config.enabled_steps or method == "none":
+            return None
+        if not self.config.adaptive:
+            return "nlm" if method == "auto" else method
+        if probe.noise_sigma < self.config.noise_threshold:
+            return None
+        if method != "auto":
+            return method
+        return "median" if probe.noise_sigma < self.config.strong_noise_threshold else "nlm_downscaled"
+
+    def _denoise(self, gray: np.ndarray, method: str) -> np.ndarray:
+        if method == "median":
+            return cv2.medianBlur(gray, 3)
+        if method == "bilateral":
+            return cv2.bilateralFilter(gray, 5, 50, 50)
+        if method == "nlm_downscaled":
+            # Denoising at reduced resolution is several times cheaper than full-page NLM
+            scale = self.config.denoise_scale
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            small = cv2.fastNlMeansDenoising(
+                small, h=max(3, int(30 * scale)), templateWindowSize=7, searchWindowSize=11
+            )
+            return cv2.resize(small, (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_CUBIC)
+        return cv2.fastNlMeansDenoising(gray, h=30, templateWindowSize=7, searchWindowSize=21)
+
+    def enhance(self, page: PageImage) -> PreprocessResult:
+        image = page.image
+        enabled = self.config.enabled_steps
         steps: list[str] = []
+        skipped: list[str] = []
+        timings: dict[str, float] = {}
+
+        def timed(name: str, func, *args):
+            started = time.perf_counter()
+            output = func(*args)
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+            return output
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = timed("grayscale", self._grayscale, image)
         steps.append("grayscale")
 
-        denoised = cv2.fastNlMeansDenoising(gray, h=30, templateWindowSize=7, searchWindowSize=21)
-        steps.append("denoise")
-
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        clahe_img = clahe.apply(denoised)
-        steps.append("clahe")
-
-        blurred = cv2.GaussianBlur(clahe_img, (3, 3), 0)
-        sharpen_kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-        sharpened = cv2.filter2D(blurred, -1, sharpen_kernel)
-        steps.append("sharpen")
-
-        thresh = cv2.adaptiveThreshold(
-            sharpened,
-            255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY,
-            31,
-            5,
-        )
-        steps.append("adaptive_threshold")
+        # Skew is probed on the page as received; noise and contrast after it was turned upright
+        orientation: Optional[Orientation] = None
+        if self.config.orientation != "none":
+            orientation = timed("orientation", self.estimate_orientation, gray)
+            if orientation is not None and (
+                orientation.rotation or abs(orientation.skew) >= self.config.min_skew
+            ):
+                gray = timed("deskew", self._apply_orientation, gray, orientation)
+                steps.append("deskew")
+            else:
+                skipped.append("deskew")
 
-        processed_path = output_dir / f"{prefix}_processed.png"
-        cv2.imwrite(str(processed_path), thresh)
+        probe = timed("probe", self.probe, gray)
+        if orientation is not None:
+            probe.skew = orientation.skew
+
+        denoiser = self._choose_denoiser(probe)
+        if denoiser:
+            gray = timed("denoise", self._denoise, gray, denoiser)
+            steps.append("denoise")
+        elif "denoise" in enabled:
+            skipped.append("denoise")
+
+        if "clahe" in enabled:
+            if self.config.adaptive and probe.contrast >= self.config.contrast_threshold:
+                skipped.append("clahe")
+            else:
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                gray = timed("clahe", clahe.apply, gray)
+                steps.append("clahe")
+
+        if "sharpen" in enabled:
+            gray = timed(
+                "sharpen",
+                lambda img: cv2.filter2D(cv2.GaussianBlur(img, (3, 3), 0), -1, _SHARPEN_KERNEL),
+                gray,
+            )
+            steps.append("sharpen")
+
+        if "threshold" in enabled:
+            gray = timed(
+                "adaptive_threshold",
+                cv2.adaptiveThreshold,
+                gray,
+                255,
+                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY,
+                31,
+                5,
+            )
+            steps.append("adaptive_threshold")
+
+        return PreprocessResult(
+            page_number=page.page_number,
+            image=gray,
+            steps=steps,
+            original_path=page.path,
+            timings_ms=timings,
+            details={
+                "probes": probe.as_dict(),
+                "denoiser": denoiser,
+                "skipped": skipped,
+                "orientation": orientation.as_dict() if orientation else None,
+            },
+        )
 
-        return PreprocessResult(original_path=image_path, processed_path=processed_path, steps=steps)
+    def enhance_region(self, image: np.ndarray, target_height: int) -> tuple[np.ndarray, np.ndarray]:
+        """Prepare a small field crop: returns ``(gray, binary)`` scaled to ``target_height``.
 
-    def save_pdf_page(self, pil_image: Image.Image, output_dir: Path, prefix: str) -> Path:
-        path = output_dir / f"{prefix}.png"
-        pil_image.save(path)
-        return path
+        Crops are tiny, so the same probes pick a denoiser without the full-page cost; the
+        grayscale version suits PaddleOCR recognition, the binarized one Tesseract.
+        """
+        gray = self._grayscale(image)
+        height = max(1, gray.shape[0])
+        scale = target_height / height
+        if abs(scale - 1.0) > 0.05:
+            interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+        probe = self.probe(gray)
+        denoiser = self._choose_denoiser(probe)
+        if denoiser:
+            gray = self._denoise(gray, "median" if denoiser.startswith("nlm") else denoiser)
+        if probe.contrast < self.config.contrast_threshold:
+            gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2, 8)).apply(gray)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return gray, binary
 
 
 PREPROCESSOR = ImagePreprocessor()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .config import CONFIG
+
+# Text height is measured on a copy no larger than this; full-size phone photos are too slow to label
+PROBE_MAX_SIDE = 2500
+# Fewer glyph-like components than this (photos, blank pages) means the estimate is not trusted
+MIN_COMPONENTS = 20
+DPI_STEP = 25
+
+
+@dataclass
+class Resolution:
+    """How a page was rasterized or rescaled before preprocessing."""
+
+    dpi: Optional[int] = None
+    scale: float = 1.0
+    text_height_px: Optional[float] = None
+    original_size: Optional[tuple[int, int]] = None
+
+    def as_dict(self) -> dict:
+        data: dict = {"scale": round(self.scale, 3)}
+        if self.dpi is not None:
+            data["dpi"] = self.dpi
+        if self.text_height_px is not None:
+            data["text_height_px"] = round(self.text_height_px, 1)
+        if self.original_size is not None:
+            data["original_size"] = list(self.original_size)
+        return data
+
+
+class ResolutionPolicy:
+    """Choose render DPI and image scale from the measured text height.
+
+    Engine cost grows with pixel count while accuracy stops improving once glyphs are
+    ~20-30 px tall, so pages are rasterized (or downscaled) to reach ``target_text_px``.
+    """
+
+    def __init__(self) -> None:
+        self.config = CONFIG.resolution
+
+    @staticmethod
+    def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+        """Median height in pixels of glyph-like connected components, or None when there is no text."""
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count <= 1:
+            return None
+        stats = stats[1:]
+        widths = stats[:, cv2.CC_STAT_WIDTH].astype(np.float32)
+        heights = stats[:, cv2.CC_STAT_HEIGHT].astype(np.float32)
+        fill = stats[:, cv2.CC_STAT_AREA] / np.maximum(widths * heights, 1.0)
+        # Drop specks, rules, table borders and photo blobs
+        glyphs = (
+            (heights >= 4)
+            & (heights <= gray.shape[0] * 0.1)
+            & (widths <= heights * 4)
+            & (fill >= 0.1)
+            & (fill <= 0.95)
+        )
+        if int(glyphs.sum()) < MIN_COMPONENTS:
+            return None
+        return float(np.median(heights[glyphs]))
+
+    def _quantize(self, dpi: float) -> int:
+        dpi = min(self.config.max_dpi, max(self.config.min_dpi, dpi))
+        return int(round(dpi / DPI_STEP) * DPI_STEP)
+
+    def pdf_dpi(self, probe: Optional[np.ndarray]) -> Resolution:
+        """Render DPI for a page from a grayscale render at ``probe_dpi`` (None when not probed)."""
+        if probe is None or not self.config.adaptive:
+            return Resolution(dpi=self.config.default_dpi)
+        probe_dpi = self.config.probe_dpi
+        text_height = self.estimate_text_height(probe)
+        if text_height is None:
+            dpi = float(self.config.default_dpi)
+        else:
+            dpi = probe_dpi * self.config.target_text_px / text_height
+        # Large-format pages are capped by pixel count, whatever their text size
+        inches = (probe.shape[0] / probe_dpi) * (probe.shape[1] / probe_dpi)
+        dpi = min(dpi, math.sqrt(self.config.max_megapixels * 1e6 / max(inches, 1e-6)))
+        scaled_text = text_height * dpi / probe_dpi if text_height is not None else None
+        return Resolution(dpi=self._quantize(dpi), text_height_px=scaled_text)
+
+    def fit_image(self, image: np.ndarray) -> tuple[np.ndarray, Resolution]:
+        """Downscale an oversized upload; images are never upscaled."""
+        height, width = image.shape[:2]
+        resolution = Resolution(original_size=(width, height))
+        scale = 1.0
+        if self.config.adaptive:
+            probe_scale = min(1.0, PROBE_MAX_SIDE / max(height, width))
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            if probe_scale < 1.0:
+                gray = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+            text_height = self.estimate_text_height(gray)
+            if text_height is not None:
+                resolution.text_height_px = text_height / probe_scale
+                scale = min(1.0, self.config.target_text_px / resolution.text_height_px)
+            # Do not shrink below what a page needs to stay legible
+            scale = max(scale, min(1.0, self.config.min_image_side / max(height, width)))
+        scale = min(scale, math.sqrt(self.config.max_megapixels * 1e6 / (height * width)))
+        if scale >= 0.95:
+            return image, resolution
+        resolution.scale = scale
+        if resolution.text_height_px is not None:
+            resolution.text_height_px *= scale
+        resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return resized, resolution
+
+    def should_rerender(self, resolution: Optional[Resolution]) -> bool:
+        if resolution is None:
+            return False
+        if resolution.dpi is not None:
+            return resolution.dpi < self.config.rerender_dpi
+        return resolution.scale < 1.0
+
+
+RESOLUTION_POLICY = ResolutionPolicy()
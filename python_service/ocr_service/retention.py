@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from .config import CONFIG
+from .database import OcrImage, OcrRun, session_scope
+from .metrics import METRICS
+from .storage import STORAGE
+
+LOGGER = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+INTERMEDIATE_ROLES = ("page", "preprocessed", "converted")
+# Staged uploads are adopted by their run within one request; older ones were orphaned by a crash
+STAGING_MAX_AGE = timedelta(hours=24)
+
+RETENTION_DELETED = METRICS.counter(
+    "ocr_retention_deleted_total", "Artifacts removed by the retention sweeper", ("kind",)
+)
+
+
+class RetentionSweeper:
+    """Background cleanup of run artifacts and their ``ocr_images`` rows.
+
+    Intermediates of finished runs go first (``OCR_RETENTION_INTERMEDIATES_HOURS``), whole
+    run directories after ``OCR_RETENTION_ORIGINALS_DAYS``. Runs and results stay in the history.
+    """
+
+    def __init__(self) -> None:
+        self.config = CONFIG.retention
+        self.last_sweep: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self.config.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ocr-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _loop(self) -> None:
+        interval = max(60.0, self.config.interval_minutes * 60)
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:  # noqa: BLE001
+                LOGGER.exception("Retention sweep failed")
+            self._stop.wait(interval)
+
+    @staticmethod
+    def _unlink(path: str, protected: str) -> None:
+        # Image uploads are their own page artifact and must outlive the intermediates
+        if path and path != protected:
+            Path(path).unlink(missing_ok=True)
+
+    def _run_root(self, run_id: int, created_at: datetime, original_file: str) -> Optional[Path]:
+        # Derived from the upload path so runs stored before sharding are found as well
+        if original_file:
+            root = Path(original_file).parent.parent
+            base = CONFIG.storage.base_dir.resolve()
+            if root.name == f"run_{run_id:08d}" and base in root.resolve().parents:
+                return root
+        root = STORAGE.run_root(run_id, created_at)
+        return root if root.exists() else None
+
+    def sweep_intermediates(self) -> int:
+        hours = self.config.intermediates_hours
+        if hours < 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        statuses = ("completed",) if self.config.keep_failed else FINISHED_STATUSES
+        removed = 0
+        while not self._stop.is_set():
+            with session_scope() as session:
+                rows = session.execute(
+                    select(OcrImage.id, OcrImage.path, OcrRun.original_file)
+                    .join(OcrRun, OcrRun.id == OcrImage.run_id)
+                    .where(
+                        OcrImage.role.in_(INTERMEDIATE_ROLES),
+                        OcrRun.status.in_(statuses),
+                        OcrRun.updated_at < cutoff,
+                    )
+                    .limit(self.config.batch_size)
+                ).all()
+                if not rows:
+                    break
+                for _, path, original_file in rows:
+                    self._unlink(path, original_file)
+                session.execute(delete(OcrImage).where(OcrImage.id.in_([row.id for row in rows])))
+            removed += len(rows)
+            RETENTION_DELETED.inc(len(rows), kind="intermediate")
+            if len(rows) < self.config.batch_size:
+                break
+        return removed
+
+    def sweep_runs(self) -> int:
+        days = self.config.originals_days
+        if days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        removed = 0
+        while not self._stop.is_set():
+            with session_scope() as session:
+                runs = session.execute(
+                    select(OcrRun.id, OcrRun.created_at, OcrRun.original_file)
+                    .where(
+                        OcrRun.created_at < cutoff,
+                        OcrRun.artifacts_purged_at.is_(None),
+                        OcrRun.status.in_(FINISHED_STATUSES),
+                    )
+                    .order_by(OcrRun.created_at)
+                    .limit(self.config.batch_size)
+                ).all()
+                if not runs:
+                    break
+                for run_id, created_at, original_file in runs:
+                    root = self._run_root(run_id, created_at, original_file)
+                    if root is not None:
+                        STORAGE.remove_run_directory(root)
+                run_ids = [row.id for row in runs]
+                session.execute(delete(OcrImage).where(OcrImage.run_id.in_(run_ids)))
+                now = datetime.utcnow()
+                for run in session.scalars(select(OcrRun).where(OcrRun.id.in_(run_ids))):
+                    run.artifacts_purged_at = now
+            removed += len(runs)
+            RETENTION_DELETED.inc(len(runs), kind="run")
+            if len(runs) < self.config.batch_size:
+                break
+        return removed
+
+    def sweep_staging(self) -> int:
+        cutoff = (datetime.now() - STAGING_MAX_AGE).timestamp()
+        removed = 0
+        for path in CONFIG.storage.staging_dir.glob("*"):
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            RETENTION_DELETED.inc(removed, kind="staged")
+        return removed
+
+    def sweep(self) -> dict:
+        started = time.perf_counter()
+        intermediates = self.sweep_intermediates()
+        runs = self.sweep_runs()
+        staged = self.sweep_staging()
+        self.last_sweep = {
+            "finished_at": datetime.utcnow().isoformat(),
+            "intermediates": intermediates,
+            "runs": runs,
+            "staged": staged,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if intermediates or runs:
+            LOGGER.info("Retention sweep removed %d intermediates and %d run directories", intermediates, runs)
+        return self.last_sweep
+
+
+RETENTION = RetentionSweeper()
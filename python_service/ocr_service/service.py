@@ -1,23 +1,44 @@
 from __future__ import annotations
 
+import base64
 import logging
 import mimetypes
-from dataclasses import dataclass
+import tarfile
+import time
+import zipfile
+from collections import Counter, deque
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Generator, Iterable, Iterator, Literal, Optional
 
+import numpy as np
 from fastapi import HTTPException
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, defer, selectinload
 
+from .archive import iter_batch_files
+from .cache import RESULT_CACHE
 from .config import CONFIG
-from .database import OcrImage, OcrResult, OcrRun, init_db, session_scope
-from .document_processor import DOCUMENT_PROCESSOR
-from .engines import OcrEngineResult, PADDLE_ENGINE, TESSERACT_ENGINE
-from .storage import STORAGE
+from .database import OcrBatch, OcrImage, OcrResult, OcrRun, init_db, session_scope
+from .document_processor import DOCUMENT_PROCESSOR, NATIVE_ENGINE, PreparedDocument
+from .engines import MERGED_ENGINE, OcrEngineResult
+from .fields import FIELD_EXTRACTOR
+from .metrics import RUN_SECONDS, RUNS_IN_FLIGHT, STAGE_SECONDS, RunTimings
+from .parallel import PAGE_POOL
+from .preprocess import PreprocessResult
+from .storage import STORAGE, SavedUpload, UploadSource, UploadTooLargeError
+from .templates import TEMPLATES
 
 LOGGER = logging.getLogger(__name__)
 
-OcrMode = Literal["auto", "fast", "enhanced"]
+OcrMode = Literal["auto", "fast", "enhanced", "cascade"]
+
+MAX_PAGE_SIZE = 500
+
+RESULT_SECTIONS = {"results", "text", "confidence", "extra", "words"}
+RUN_SECTIONS = RESULT_SECTIONS | {"images"}
+DEFAULT_SECTIONS = {"results", "text", "confidence", "extra", "images"}
 
 
 @dataclass
@@ -26,6 +47,9 @@ class ServiceResult:
     mode: str
     results: list[OcrEngineResult]
     selected_engine: str
+    summary: dict = field(default_factory=dict)
+    # Template runs: structured fields keyed by name
+    fields: dict = field(default_factory=dict)
 
 
 class OcrService:
@@ -41,141 +65,667 @@ class OcrService:
                 setattr(run, key, value)
             run.updated_at = datetime.utcnow()
 
-    def _record_images(self, run_id: int, prepared) -> None:
-        with session_scope() as session:
-            run = session.get(OcrRun, run_id)
-            if not run:
-                raise RuntimeError(f"Run {run_id} not found")
-            original = OcrImage(
+    def _image_rows(self, run_id: int, prepared: PreparedDocument) -> list[OcrImage]:
+        rows = [
+            OcrImage(
                 run_id=run_id,
                 role="original",
                 path=str(prepared.original_path),
                 page_number=None,
                 step="upload",
             )
-            session.add(original)
-            for conversion, path in prepared.converted_files:
-                image = OcrImage(
+        ]
+        for conversion, path in prepared.converted_files:
+            rows.append(
+                OcrImage(
                     run_id=run_id,
                     role="converted",
                     path=str(path),
                     page_number=None,
                     step=conversion,
                 )
-                session.add(image)
-            for idx, page in enumerate(prepared.page_images, start=1):
-                session.add(
-                    OcrImage(
-                        run_id=run_id,
-                        role="page",
-                        path=str(page),
-                        page_number=idx,
-                        step="page_image",
-                    )
-                )
-            for idx, pre in enumerate(prepared.preprocessed, start=1):
-                img = OcrImage(
+            )
+        for page in prepared.page_images:
+            if page.path is None:
+                continue
+            rows.append(
+                OcrImage(
                     run_id=run_id,
-                    role="preprocessed",
-                    path=str(pre.processed_path),
-                    page_number=idx,
-                    step="preprocess",
+                    role="page",
+                    path=str(page.path),
+                    page_number=page.page_number,
+                    step="page_image",
                 )
-                img.set_metadata({"steps": pre.steps})
-                session.add(img)
+            )
+        for pre in prepared.preprocessed:
+            if pre.processed_path is None:
+                continue
+            img = OcrImage(
+                run_id=run_id,
+                role="preprocessed",
+                path=str(pre.processed_path),
+                page_number=pre.page_number,
+                step="preprocess",
+            )
+            img.set_metadata(pre.metadata())
+            rows.append(img)
+        return rows
 
     def _persist_results(
         self,
         run_id: int,
         mode: OcrMode,
+        prepared: PreparedDocument,
         results: list[OcrEngineResult],
         selected_engine: str,
+        extras: Optional[dict] = None,
     ) -> None:
+        """Write image rows, result rows and the final run state in a single transaction."""
+        entities: list[OcrResult] = []
+        for result in results:
+            entity = OcrResult(
+                run_id=run_id,
+                engine=result.engine,
+                mode=mode,
+                page_number=result.page_number,
+                text=result.text,
+                confidence=result.confidence,
+            )
+            entity.set_extra(result.extra)
+            entities.append(entity)
+
         with session_scope() as session:
-            for result in results:
-                entity = OcrResult(
-                    run_id=run_id,
-                    engine=result.engine,
-                    mode=mode,
-                    page_number=result.page_number,
-                    text=result.text,
-                    confidence=result.confidence,
-                )
-                entity.set_extra(result.extra)
-                session.add(entity)
             run = session.get(OcrRun, run_id)
             if not run:
                 raise RuntimeError(f"Run {run_id} not found while persisting results")
+            session.add_all(self._image_rows(run_id, prepared))
+            session.add_all(entities)
             run.status = "completed"
             run.engine_used = selected_engine
-            run.set_extra({"selected_engine": selected_engine})
+            run.update_extra({"selected_engine": selected_engine, **(extras or {})})
             run.updated_at = datetime.utcnow()
 
-    def process(self, file_bytes: bytes, filename: str, mode: OcrMode = "auto") -> ServiceResult:
-        if len(file_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty file provided")
+    def _add_run(
+        self,
+        session: Session,
+        filename: str,
+        mode: OcrMode,
+        status: str,
+        batch_id: Optional[int] = None,
+        extras: Optional[dict] = None,
+    ) -> OcrRun:
+        mime, _ = mimetypes.guess_type(filename)
+        run = OcrRun(
+            original_file=filename,
+            original_mime=mime,
+            mode=mode,
+            status=status,
+            batch_id=batch_id,
+        )
+        run.set_extra(extras)
+        session.add(run)
+        session.flush()
+        return run
+
+    @staticmethod
+    def _stage_upload(source: UploadSource, filename: str) -> SavedUpload:
+        # Copied before any transaction is opened: a slow upload must not hold the SQLite write lock
         max_bytes = CONFIG.allowed_file_size_mb * 1024 * 1024
-        if len(file_bytes) > max_bytes:
+        started = time.perf_counter()
+        try:
+            saved = STORAGE.stage_upload(source, filename, max_bytes=max_bytes)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="upload")
+        except UploadTooLargeError as exc:
             raise HTTPException(
                 status_code=413,
                 detail=f"File too large. Max size is {CONFIG.allowed_file_size_mb} MB",
+            ) from exc
+        if saved.size == 0:
+            saved.path.unlink(missing_ok=True)
+            raise HTTPException(status_code=400, detail="Empty file provided")
+        return saved
+
+    @staticmethod
+    def _attach_upload(run: OcrRun, saved: SavedUpload) -> None:
+        # The upload path depends on the run id, so the row is flushed first
+        run_dirs = STORAGE.prepare_run_directory(run.id, run.created_at)
+        saved = STORAGE.adopt_upload(saved, run_dirs["uploads"])
+        run.original_file = str(saved.path)
+        run.update_extra({"content_hash": saved.sha256, "size_bytes": saved.size})
+
+    @staticmethod
+    def _template_extras(doc_type: Optional[str], sampler: Optional[str]) -> Optional[dict]:
+        if not doc_type and not sampler:
+            return None
+        try:
+            selection = TEMPLATES.resolve(doc_type, sampler)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return {"template": selection.as_dict()}
+
+    def create_run(
+        self,
+        source: UploadSource,
+        filename: str,
+        mode: OcrMode = "auto",
+        status: str = "queued",
+        doc_type: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ) -> int:
+        """Create a run and stream its upload (bytes, a path or a binary file object) into storage.
+
+        With a doc type or sampler the run only recognizes that template's fields.
+        """
+        extras = self._template_extras(doc_type, sampler)
+        saved = self._stage_upload(source, filename)
+        run_root: Optional[Path] = None
+        try:
+            with session_scope() as session:
+                run = self._add_run(session, filename, mode, status, extras=extras)
+                run_root = STORAGE.run_root(run.id, run.created_at)
+                self._attach_upload(run, saved)
+                return run.id
+        except BaseException:
+            # The run was rolled back: drop the upload wherever it ended up
+            saved.path.unlink(missing_ok=True)
+            if run_root is not None:
+                STORAGE.remove_run_directory(run_root)
+            raise
+
+    def create_batch(
+        self,
+        uploads: Iterable[tuple[str, UploadSource]],
+        mode: OcrMode = "auto",
+        doc_type: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ) -> tuple[int, list[int]]:
+        """Create a batch and all its runs in one transaction; returns the batch id and the queued run ids.
+
+        Every file is staged first, so the transaction only inserts rows and renames files. Files
+        that fail validation are recorded as failed runs instead of rejecting the whole batch.
+        """
+        extras = self._template_extras(doc_type, sampler)
+        # (filename, staged upload or None, validation error)
+        staged: list[tuple[str, Optional[SavedUpload], Optional[str]]] = []
+        try:
+            for filename, source in iter_batch_files(uploads):
+                if len(staged) >= CONFIG.batch.max_files:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Too many files. Max is {CONFIG.batch.max_files} per batch",
+                    )
+                try:
+                    staged.append((filename, self._stage_upload(source, filename), None))
+                except HTTPException as exc:
+                    staged.append((filename, None, str(exc.detail)))
+            if not staged:
+                raise HTTPException(status_code=400, detail="No files provided")
+        except (zipfile.BadZipFile, tarfile.TarError) as exc:
+            self._discard_staged(staged)
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {exc}") from exc
+        except BaseException:
+            self._discard_staged(staged)
+            raise
+
+        created: list[Path] = []
+        queued: list[int] = []
+        try:
+            with session_scope() as session:
+                batch = OcrBatch(mode=mode, file_count=len(staged))
+                session.add(batch)
+                session.flush()
+                for filename, saved, error in staged:
+                    status = "queued" if saved is not None else "failed"
+                    run = self._add_run(session, filename, mode, status, batch_id=batch.id, extras=extras)
+                    if saved is None:
+                        run.error_message = error
+                        continue
+                    created.append(STORAGE.run_root(run.id, run.created_at))
+                    self._attach_upload(run, saved)
+                    queued.append(run.id)
+                batch_id = batch.id
+        except BaseException:
+            # The transaction was rolled back, so uploads already moved have no owner
+            self._discard_staged(staged)
+            for run_root in created:
+                STORAGE.remove_run_directory(run_root)
+            raise
+        return batch_id, queued
+
+    @staticmethod
+    def _discard_staged(staged: list[tuple[str, Optional[SavedUpload], Optional[str]]]) -> None:
+        for _, saved, _ in staged:
+            if saved is not None:
+                saved.path.unlink(missing_ok=True)
+
+    def get_batch(self, batch_id: int) -> dict:
+        with session_scope() as session:
+            batch = session.get(OcrBatch, batch_id)
+            if not batch:
+                raise HTTPException(status_code=404, detail="Batch not found")
+            rows = session.execute(
+                select(
+                    OcrRun.id,
+                    OcrRun.original_file,
+                    OcrRun.status,
+                    OcrRun.engine_used,
+                    OcrRun.error_message,
+                )
+                .where(OcrRun.batch_id == batch_id)
+                .order_by(OcrRun.id)
+            ).all()
+            counts = Counter(row.status for row in rows)
+            unfinished = counts["queued"] + counts["processing"]
+            if unfinished:
+                # Runs that already failed at upload do not mean the batch has started
+                status = "processing" if counts["queued"] < unfinished else "queued"
+            elif counts["failed"] == len(rows):
+                status = "failed"
+            elif counts["failed"]:
+                status = "completed_with_errors"
+            else:
+                status = "completed"
+            return {
+                "id": batch.id,
+                "mode": batch.mode,
+                "created_at": batch.created_at.isoformat(),
+                "file_count": batch.file_count,
+                "status": status,
+                "counts": dict(counts),
+                "runs": [
+                    {
+                        "id": row.id,
+                        "original_file": row.original_file,
+                        "status": row.status,
+                        "engine_used": row.engine_used,
+                        "error_message": row.error_message,
+                    }
+                    for row in rows
+                ],
+            }
+
+    def mark_failed(self, run_id: int, error_message: str) -> None:
+        self._update_run(run_id, status="failed", error_message=error_message)
+
+    def recover_interrupted_runs(self) -> list[int]:
+        """Reset runs a previous process left ``queued`` or ``processing``; returns the ids to enqueue again.
+
+        Results are written in one transaction, so an interrupted run has nothing to undo. Each run is
+        retried once: a run interrupted again (e.g. a page that takes the process down) is marked failed.
+        """
+        retry: list[int] = []
+        with session_scope() as session:
+            runs = session.scalars(
+                select(OcrRun).where(OcrRun.status.in_(("queued", "processing"))).order_by(OcrRun.id)
+            ).all()
+            for run in runs:
+                run.updated_at = datetime.utcnow()
+                if run.get_extra().get("recovered") or not Path(run.original_file).is_file():
+                    run.status = "failed"
+                    run.error_message = "Interrupted by a service restart"
+                    continue
+                run.status = "queued"
+                run.update_extra({"recovered": True})
+                retry.append(run.id)
+        if runs:
+            LOGGER.warning("Found %d interrupted runs, %d re-queued", len(runs), len(retry))
+        return retry
+
+    def _from_cache(self, run_id: int, mode: OcrMode, cache_key: str) -> Optional[ServiceResult]:
+        source_run_id = RESULT_CACHE.get_document(cache_key)
+        if source_run_id is None or source_run_id == run_id:
+            return None
+        with session_scope() as session:
+            source = session.get(OcrRun, source_run_id)
+            if not source or source.status != "completed" or not source.engine_used:
+                return None
+            selected_engine = source.engine_used
+            source_extras = source.get_extra()
+            page_engines: dict[str, str] = source_extras.get("page_engines", {})
+            results = [
+                OcrEngineResult(
+                    text=entity.text,
+                    confidence=entity.confidence,
+                    engine=entity.engine,
+                    page_number=entity.page_number,
+                    extra={},
+                )
+                for entity in sorted(source.results, key=lambda item: item.page_number or 0)
+                if entity.engine == page_engines.get(str(entity.page_number), selected_engine)
+                or entity.engine == NATIVE_ENGINE
+            ]
+            run = session.get(OcrRun, run_id)
+            if not run:
+                raise RuntimeError(f"Run {run_id} not found")
+            run.status = "completed"
+            run.engine_used = selected_engine
+            run.update_extra(
+                {"selected_engine": selected_engine, "page_engines": page_engines, "cached_from": source_run_id}
             )
+            run.updated_at = datetime.utcnow()
+        LOGGER.info("Run %s served from cache (source run %s)", run_id, source_run_id)
+        summary = {"cached_from": source_run_id}
+        return ServiceResult(
+            run_id=run_id, mode=mode, results=results, selected_engine=selected_engine, summary=summary
+        )
 
-        mime, _ = mimetypes.guess_type(filename)
+    @staticmethod
+    def _page_event(page_number: Optional[int], results: list[OcrEngineResult]) -> dict:
+        return {
+            "event": "page",
+            "page_number": page_number,
+            "results": [
+                {"engine": res.engine, "confidence": res.confidence, "text": res.text} for res in results
+            ],
+        }
+
+    @staticmethod
+    def _summary_event(result: ServiceResult, page_engines: dict[str, str]) -> dict:
+        return {
+            "event": "summary",
+            "run_id": result.run_id,
+            "mode": result.mode,
+            "status": "completed",
+            "selected_engine": result.selected_engine,
+            "page_engines": page_engines,
+            "summary": result.summary,
+        }
+
+    def stream_execute(self, run_id: int) -> Generator[dict, None, ServiceResult]:
+        """Process a run, yielding progress and per-page events as soon as they are available.
+
+        The generator's return value is the same ``ServiceResult`` that ``execute`` returns.
+        """
+        RUNS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        status = "failed"
+        try:
+            result = yield from self._run_pipeline(run_id)
+            status = "cached" if "cached_from" in result.summary else "completed"
+            return result
+        finally:
+            RUNS_IN_FLIGHT.dec()
+            RUN_SECONDS.observe(time.perf_counter() - started, status=status)
+
+    def _run_pipeline(self, run_id: int) -> Generator[dict, None, ServiceResult]:
+        timings = RunTimings()
         with session_scope() as session:
-            temp_run = OcrRun(
-                original_file=filename,
-                original_mime=mime,
+            run = session.get(OcrRun, run_id)
+            if not run:
+                raise RuntimeError(f"Run {run_id} not found")
+            mode: OcrMode = run.mode  # type: ignore[assignment]
+            saved_path = Path(run.original_file)
+            created_at = run.created_at
+            extras = run.get_extra()
+            content_hash = extras.get("content_hash")
+            run.status = "processing"
+            run.updated_at = datetime.utcnow()
+        template = extras.get("template")
+        cache_key = RESULT_CACHE.document_key(content_hash, mode) if content_hash and not template else None
+        cached: Optional[ServiceResult] = None
+        # The run is already "processing": setup failures must mark it failed like the pipeline below does
+        try:
+            yield {"event": "run", "run_id": run_id, "mode": mode, "status": "processing"}
+            run_dirs = STORAGE.prepare_run_directory(run_id, created_at)
+            if cache_key and RESULT_CACHE.enabled:
+                with timings.span("cache_lookup"):
+                    cached = self._from_cache(run_id, mode, cache_key)
+        except GeneratorExit:
+            self.mark_failed(run_id, "Processing aborted before completion")
+            raise
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("OCR processing failed")
+            self.mark_failed(run_id, str(exc))
+            raise HTTPException(status_code=500, detail=f"OCR processing failed: {exc}") from exc
+
+        if template:
+            return (yield from self._run_template(run_id, mode, saved_path, run_dirs, template, timings))
+        if cached is not None:
+            # _from_cache already completed the run
+            for res in cached.results:
+                yield self._page_event(res.page_number, [res])
+            with session_scope() as session:
+                page_engines = session.get(OcrRun, run_id).get_extra().get("page_engines", {})
+            yield self._summary_event(cached, page_engines)
+            return cached
+
+        persisted = False
+        try:
+            yield {"event": "progress", "stage": "prepare", "file": saved_path.name}
+            prepared = DOCUMENT_PROCESSOR.prepare(saved_path, run_dirs, timings)
+            yield {
+                "event": "progress",
+                "stage": "prepared",
+                "page_count": prepared.page_count,
+                "converted": [conversion for conversion, _ in prepared.converted_files],
+                "native_pages": len(prepared.native_results),
+            }
+            all_results: list[OcrEngineResult] = list(prepared.native_results)
+            for res in prepared.native_results:
+                yield self._page_event(res.page_number, [res])
+
+            # Pages are pulled ahead of recognition, so preprocessing progress is reported as it is drained
+            preprocessed: deque[int] = deque()
+
+            def page_inputs() -> Iterator[tuple[int, np.ndarray]]:
+                for prep in prepared.pages:
+                    preprocessed.append(prep.page_number)
+                    yield prep.page_number, prep.image
+
+            for page_results in PAGE_POOL.map(page_inputs(), mode, timings):
+                while preprocessed:
+                    yield {"event": "progress", "stage": "preprocessed", "page_number": preprocessed.popleft()}
+                all_results.extend(page_results)
+                page_number = page_results[0].page_number if page_results else None
+                yield self._page_event(page_number, page_results)
+            rerendered = yield from self._rerender_pages(prepared, all_results, mode, run_dirs, timings)
+
+            ocr_results = [res for res in all_results if res.engine != NATIVE_ENGINE]
+            native_results = [res for res in all_results if res.engine == NATIVE_ENGINE]
+            summary: dict = {"rerendered_pages": rerendered} if rerendered else {}
+            if mode == "cascade":
+                page_results = self._select_per_page(ocr_results)
+                summary["cascade"] = self._cascade_summary(ocr_results)
+            else:
+                engine = self._select_engine(ocr_results, mode) if ocr_results else NATIVE_ENGINE
+                page_results = [res for res in ocr_results if res.engine == engine]
+            selected_results = sorted(native_results + page_results, key=lambda res: res.page_number or 0)
+
+            engines_used = {res.engine for res in page_results}
+            if not engines_used:
+                selected_engine = NATIVE_ENGINE
+            elif len(engines_used) == 1:
+                selected_engine = engines_used.pop()
+            else:
+                selected_engine = "mixed"
+            page_engines = {str(res.page_number): res.engine for res in selected_results}
+            # The stored timings cannot include the write that stores them; the response summary does
+            with timings.span("persist"):
+                self._persist_results(
+                    run_id,
+                    mode,
+                    prepared,
+                    all_results,
+                    selected_engine,
+                    extras={"page_engines": page_engines, "timings": timings.as_dict(), **summary},
+                )
+            persisted = True
+            summary["timings"] = timings.as_dict()
+            if cache_key:
+                RESULT_CACHE.put_document(cache_key, run_id)
+
+            result = ServiceResult(
+                run_id=run_id,
                 mode=mode,
-                status="initializing",
+                results=selected_results,
+                selected_engine=selected_engine,
+                summary=summary,
             )
-            session.add(temp_run)
-            session.flush()
-            run_id = temp_run.id
-
-        run_dirs = STORAGE.prepare_run_directory(run_id)
-        saved_path = STORAGE.save_upload(file_bytes, filename, run_dirs["uploads"])
-        self._update_run(
-            run_id,
-            original_file=str(saved_path),
-            original_mime=mime,
-            status="processing",
-        )
+            yield self._summary_event(result, page_engines)
+            return result
+        except GeneratorExit:
+            # The consumer went away (e.g. a streaming client disconnected) before the run finished
+            if not persisted:
+                self.mark_failed(run_id, "Processing aborted before completion")
+            raise
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("OCR processing failed")
+            self.mark_failed(run_id, str(exc))
+            raise HTTPException(status_code=500, detail=f"OCR processing failed: {exc}") from exc
+
+    def _rerender_pages(
+        self,
+        prepared: PreparedDocument,
+        results: list[OcrEngineResult],
+        mode: OcrMode,
+        run_dirs: dict[str, Path],
+        timings: RunTimings,
+    ) -> Generator[dict, None, list[int]]:
+        """OCR pages whose best score is under ``OCR_RERENDER_BELOW_CONFIDENCE`` again from more pixels.
 
+        The better attempt replaces the page's entries in ``results``; returns the improved page numbers.
+        """
+        threshold = CONFIG.resolution.rerender_below_confidence / 100.0
+        if threshold <= 0:
+            return []
+        best: dict[int, float] = {}
+        for res in results:
+            if res.engine != NATIVE_ENGINE and res.page_number is not None:
+                best[res.page_number] = max(best.get(res.page_number, 0.0), res.score or 0.0)
+        low = sorted(page for page, score in best.items() if score < threshold)
+        if not low:
+            return []
+        yield {"event": "progress", "stage": "rerender", "pages": low}
+        improved: list[int] = []
+        pages = DOCUMENT_PROCESSOR.rerender(prepared, low, run_dirs)
+        for page_results in PAGE_POOL.map(((prep.page_number, prep.image) for prep in pages), mode, timings):
+            if not page_results:
+                continue
+            page_number = page_results[0].page_number
+            if max(res.score or 0.0 for res in page_results) <= best[page_number]:
+                continue
+            results[:] = [res for res in results if res.page_number != page_number] + page_results
+            improved.append(page_number)
+            yield {**self._page_event(page_number, page_results), "rerendered": True}
+        LOGGER.info("Re-rendered %d low-confidence page(s), %d improved", len(low), len(improved))
+        return improved
+
+    def _run_template(
+        self,
+        run_id: int,
+        mode: OcrMode,
+        saved_path: Path,
+        run_dirs: dict[str, Path],
+        template: dict,
+        timings: RunTimings,
+    ) -> Generator[dict, None, ServiceResult]:
+        """Field-targeted OCR: only the template regions of the first page are preprocessed and recognized."""
+        persisted = False
         try:
-            prepared = DOCUMENT_PROCESSOR.prepare(saved_path, run_dirs)
-            self._record_images(run_id, prepared)
+            selection = TEMPLATES.resolve(template.get("doc_type"), template.get("sampler"))
+            yield {"event": "progress", "stage": "prepare", "file": saved_path.name}
+            page = DOCUMENT_PROCESSOR.load_first_page(saved_path, run_dirs, timings)
+            fields, card, located = FIELD_EXTRACTOR.extract(page.image, selection, mode, timings)
+            card_path = STORAGE.save_image(card, run_dirs["intermediates"] / "card.png")
+            for result in fields:
+                yield {"event": "field", "name": result.name, **result.as_dict()}
 
             all_results: list[OcrEngineResult] = []
-            for idx, prep in enumerate(prepared.preprocessed, start=1):
-                if mode in ("fast", "auto"):
-                    tess_result = TESSERACT_ENGINE.run(prep.processed_path, page_number=idx)
-                    all_results.append(tess_result)
-                if mode in ("enhanced", "auto"):
-                    paddle_result = PADDLE_ENGINE.run(prep.processed_path, page_number=idx)
-                    all_results.append(paddle_result)
-
-            selected_engine = self._select_engine(all_results, mode)
-            self._persist_results(run_id, mode, all_results, selected_engine)
-
-            selected_results = [res for res in all_results if res.engine == selected_engine]
-            return ServiceResult(run_id=run_id, mode=mode, results=selected_results, selected_engine=selected_engine)
+            selected_results: list[OcrEngineResult] = []
+            for result in fields:
+                for candidate in result.candidates:
+                    selected = candidate.engine == result.engine
+                    extra = {"field": result.name, "value": result.value, "valid": result.valid}
+                    entity = replace(candidate, extra={**extra, "selected": selected})
+                    all_results.append(entity)
+                    if selected:
+                        selected_results.append(entity)
+            engines_used = {res.engine for res in selected_results}
+            selected_engine = engines_used.pop() if len(engines_used) == 1 else "mixed" if engines_used else "none"
+            field_data = {result.name: result.as_dict() for result in fields}
+            prepared = PreparedDocument(
+                original_path=saved_path,
+                mime_type=DOCUMENT_PROCESSOR.detect_mime(saved_path),
+                pages=iter(()),
+                converted_files=[],
+                page_count=1,
+                page_images=[replace(page, image=None)],
+                preprocessed=[
+                    PreprocessResult(
+                        page_number=page.page_number,
+                        image=None,
+                        steps=["locate_card", "crop_fields"],
+                        original_path=page.path,
+                        processed_path=card_path,
+                        details={"card_located": located},
+                    )
+                ],
+            )
+            with timings.span("persist"):
+                self._persist_results(
+                    run_id,
+                    mode,
+                    prepared,
+                    all_results,
+                    selected_engine,
+                    extras={"fields": field_data, "card_located": located, "timings": timings.as_dict()},
+                )
+            persisted = True
+            summary = {"template": selection.as_dict(), "card_located": located, "timings": timings.as_dict()}
+            result = ServiceResult(
+                run_id=run_id,
+                mode=mode,
+                results=selected_results,
+                selected_engine=selected_engine,
+                summary=summary,
+                fields=field_data,
+            )
+            yield {**self._summary_event(result, {}), "fields": field_data}
+            return result
+        except GeneratorExit:
+            if not persisted:
+                self.mark_failed(run_id, "Processing aborted before completion")
+            raise
         except Exception as exc:  # noqa: BLE001
-            LOGGER.exception("OCR processing failed")
-            self._update_run(run_id, status="failed", error_message=str(exc))
+            LOGGER.exception("Template OCR failed")
+            self.mark_failed(run_id, str(exc))
             raise HTTPException(status_code=500, detail=f"OCR processing failed: {exc}") from exc
 
+    def execute(self, run_id: int) -> ServiceResult:
+        events = self.stream_execute(run_id)
+        while True:
+            try:
+                next(events)
+            except StopIteration as stop:
+                return stop.value
+
+    def process(
+        self,
+        source: UploadSource,
+        filename: str,
+        mode: OcrMode = "auto",
+        doc_type: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ) -> ServiceResult:
+        run_id = self.create_run(
+            source, filename, mode=mode, status="processing", doc_type=doc_type, sampler=sampler
+        )
+        return self.execute(run_id)
+
     def _select_engine(self, results: list[OcrEngineResult], mode: OcrMode) -> str:
         if mode == "fast":
             return "tesseract"
         if mode == "enhanced":
             return "paddleocr"
+        if any(result.engine == MERGED_ENGINE for result in results):
+            # Shared detection already picked the better engine line by line
+            return MERGED_ENGINE
 
-        # Auto mode: choose engine with highest average confidence
+        # Auto mode: choose engine with highest average confidence (on the same 0..1 scale)
         engine_conf: dict[str, list[float]] = {}
         for result in results:
-            if result.confidence is not None:
-                engine_conf.setdefault(result.engine, []).append(result.confidence)
+            if result.score is not None:
+                engine_conf.setdefault(result.engine, []).append(result.score)
 
         if not engine_conf:
             return "tesseract"
@@ -189,12 +739,89 @@ class OcrService:
             return "tesseract"
         return max(avg_conf, key=avg_conf.get)
 
-    def get_run(self, run_id: int) -> dict:
+    def _select_per_page(self, results: list[OcrEngineResult]) -> list[OcrEngineResult]:
+        best: dict[Optional[int], OcrEngineResult] = {}
+        for result in results:
+            current = best.get(result.page_number)
+            if current is None or (result.score or 0.0) > (current.score or 0.0):
+                best[result.page_number] = result
+        return list(best.values())
+
+    def _cascade_summary(self, results: list[OcrEngineResult]) -> dict:
+        pages = {res.page_number for res in results}
+        escalated = {res.page_number for res in results if res.engine == "paddleocr"}
+        return {
+            "pages": len(pages),
+            "paddle_pages": len(escalated),
+            "paddle_skipped": len(pages) - len(escalated),
+            "min_confidence": CONFIG.cascade.min_confidence,
+        }
+
+    @staticmethod
+    def _parse_include(include: Optional[str]) -> set[str]:
+        if not include:
+            return set(DEFAULT_SECTIONS)
+        sections = {item.strip().lower() for item in include.split(",") if item.strip()}
+        unknown = sections - RUN_SECTIONS
+        if unknown:
+            detail = f"Unknown include section(s): {', '.join(sorted(unknown))}"
+            raise HTTPException(status_code=400, detail=detail)
+        return sections
+
+    @staticmethod
+    def _result_options(sections: set[str]) -> list:
+        options = []
+        if "text" not in sections:
+            options.append(defer(OcrResult.text))
+        # Word details are returned inside "extra", so either section needs the column
+        if "extra" not in sections and "words" not in sections:
+            options.append(defer(OcrResult.extra_json))
+        if "words" in sections:
+            options.append(selectinload(OcrResult.detail))
+        return options
+
+    @staticmethod
+    def _result_payload(result: OcrResult, sections: set[str]) -> dict:
+        payload: dict = {"id": result.id, "engine": result.engine, "page_number": result.page_number}
+        if "confidence" in sections:
+            payload["confidence"] = result.confidence
+        if "text" in sections:
+            payload["text"] = result.text
+        if "extra" in sections or "words" in sections:
+            payload["extra"] = result.get_extra(include_details="words" in sections)
+        return payload
+
+    @staticmethod
+    def _image_payload(image: OcrImage) -> dict:
+        return {
+            "id": image.id,
+            "role": image.role,
+            "path": image.path,
+            "page_number": image.page_number,
+            "step": image.step,
+            "metadata": image.get_metadata(),
+        }
+
+    @staticmethod
+    def _is_selected(result: OcrResult, extras: dict) -> bool:
+        page_engines: dict[str, str] = extras.get("page_engines", {})
+        expected = page_engines.get(str(result.page_number), extras.get("selected_engine"))
+        return result.engine in (expected, NATIVE_ENGINE)
+
+    def _load_run(self, session, run_id: int) -> tuple[OcrRun, dict, int]:
+        run = session.get(OcrRun, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        extras = run.get_extra()
+        # Runs served from the cache point at the results and images of their source run
+        return run, extras, extras.get("cached_from") or run.id
+
+    def get_run(self, run_id: int, include: Optional[str] = None, selected_only: bool = False) -> dict:
+        """Return a run with only the requested sections (results, text, confidence, extra, words, images)."""
+        sections = self._parse_include(include)
         with session_scope() as session:
-            run = session.get(OcrRun, run_id)
-            if not run:
-                raise HTTPException(status_code=404, detail="Run not found")
-            return {
+            run, extras, data_run_id = self._load_run(session, run_id)
+            payload: dict = {
                 "id": run.id,
                 "mode": run.mode,
                 "status": run.status,
@@ -203,51 +830,129 @@ class OcrService:
                 "created_at": run.created_at.isoformat(),
                 "updated_at": run.updated_at.isoformat(),
                 "error_message": run.error_message,
-                "extras": run.get_extra(),
+                "extras": extras,
+            }
+            if sections & RESULT_SECTIONS:
+                results = session.scalars(
+                    select(OcrResult)
+                    .where(OcrResult.run_id == data_run_id)
+                    .options(*self._result_options(sections))
+                    .order_by(OcrResult.page_number, OcrResult.id)
+                ).all()
+                payload["results"] = [
+                    self._result_payload(result, sections)
+                    for result in results
+                    if not selected_only or self._is_selected(result, extras)
+                ]
+            if "images" in sections:
+                images = session.scalars(
+                    select(OcrImage).where(OcrImage.run_id == data_run_id).order_by(OcrImage.id)
+                ).all()
+                payload["images"] = [self._image_payload(image) for image in images]
+            return payload
+
+    def get_page(
+        self,
+        run_id: int,
+        page_number: int,
+        include: Optional[str] = None,
+        selected_only: bool = False,
+    ) -> dict:
+        sections = self._parse_include(include)
+        with session_scope() as session:
+            _, extras, data_run_id = self._load_run(session, run_id)
+            results = session.scalars(
+                select(OcrResult)
+                .where(OcrResult.run_id == data_run_id, OcrResult.page_number == page_number)
+                .options(*self._result_options(sections))
+                .order_by(OcrResult.id)
+            ).all()
+            if not results:
+                raise HTTPException(status_code=404, detail="Page not found")
+            page_engines: dict[str, str] = extras.get("page_engines", {})
+            payload: dict = {
+                "run_id": run_id,
+                "page_number": page_number,
+                "selected_engine": page_engines.get(str(page_number), extras.get("selected_engine")),
                 "results": [
-                    {
-                        "id": result.id,
-                        "engine": result.engine,
-                        "page_number": result.page_number,
-                        "confidence": result.confidence,
-                        "text": result.text,
-                        "extra": result.get_extra(),
-                    }
-                    for result in run.results
+                    self._result_payload(result, sections)
+                    for result in results
+                    if not selected_only or self._is_selected(result, extras)
                 ],
-                "images": [
+            }
+            if "images" in sections:
+                images = session.scalars(
+                    select(OcrImage)
+                    .where(OcrImage.run_id == data_run_id, OcrImage.page_number == page_number)
+                    .order_by(OcrImage.id)
+                ).all()
+                payload["images"] = [self._image_payload(image) for image in images]
+            return payload
+
+    @staticmethod
+    def _encode_cursor(run: OcrRun) -> str:
+        raw = f"{run.created_at.isoformat()}|{run.id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            created_at, run_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(run_id)
+        except (ValueError, UnicodeError) as exc:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+    def list_runs(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        mode: Optional[str] = None,
+        engine_used: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> dict:
+        """Newest-first run listing with keyset pagination on (created_at, id)."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = select(OcrRun)
+        if status:
+            query = query.where(OcrRun.status == status)
+        if mode:
+            query = query.where(OcrRun.mode == mode)
+        if engine_used:
+            query = query.where(OcrRun.engine_used == engine_used)
+        if created_from:
+            query = query.where(OcrRun.created_at >= created_from)
+        if created_to:
+            query = query.where(OcrRun.created_at < created_to)
+        if cursor:
+            cursor_created_at, cursor_id = self._decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    OcrRun.created_at < cursor_created_at,
+                    and_(OcrRun.created_at == cursor_created_at, OcrRun.id < cursor_id),
+                )
+            )
+        query = query.order_by(OcrRun.created_at.desc(), OcrRun.id.desc()).limit(limit + 1)
+
+        with session_scope() as session:
+            runs = session.scalars(query).all()
+            page, has_more = runs[:limit], len(runs) > limit
+            return {
+                "items": [
                     {
-                        "id": image.id,
-                        "role": image.role,
-                        "path": image.path,
-                        "page_number": image.page_number,
-                        "step": image.step,
-                        "metadata": image.get_metadata(),
+                        "id": run.id,
+                        "mode": run.mode,
+                        "status": run.status,
+                        "engine_used": run.engine_used,
+                        "created_at": run.created_at.isoformat(),
+                        "updated_at": run.updated_at.isoformat(),
+                        "original_file": run.original_file,
                     }
-                    for image in run.images
+                    for run in page
                 ],
+                "next_cursor": self._encode_cursor(page[-1]) if has_more else None,
             }
 
-    def list_runs(self, limit: int = 50) -> list[dict]:
-        with session_scope() as session:
-            runs = (
-                session.query(OcrRun)
-                .order_by(OcrRun.created_at.desc())
-                .limit(limit)
-                .all()
-            )
-            return [
-                {
-                    "id": run.id,
-                    "mode": run.mode,
-                    "status": run.status,
-                    "engine_used": run.engine_used,
-                    "created_at": run.created_at.isoformat(),
-                    "updated_at": run.updated_at.isoformat(),
-                    "original_file": run.original_file,
-                }
-                for run in runs
-            ]
-
 
 SERVICE = OcrService()
@@ -1,16 +1,50 @@
 from __future__ import annotations
 
+import hashlib
+import io
+import logging
 import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import BinaryIO, Iterable, Optional, Union
+
+import cv2
+import numpy as np
+from PIL import Image
 
 from .config import CONFIG
 
+LOGGER = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+UploadSource = Union[bytes, Path, BinaryIO]
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+@dataclass
+class SavedUpload:
+    path: Path
+    size: int
+    sha256: str
+
 
 class StorageManager:
     def __init__(self) -> None:
         self.config = CONFIG.storage
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._writer_lock = threading.Lock()
+        # Queued writes hold full-resolution page arrays: once the writers lag this many pages behind,
+        # save_image blocks the producer instead of letting memory grow with the page count
+        self._pending_writes = threading.BoundedSemaphore(
+            max(1, self.config.artifact_writers) + max(1, CONFIG.pipeline.prefetch_pages)
+        )
         self._ensure_directories()
 
     def _ensure_directories(self) -> None:
@@ -19,11 +53,30 @@ class StorageManager:
             self.config.uploads_dir,
             self.config.intermediates_dir,
             self.config.outputs_dir,
+            self.config.runs_dir,
+            self.config.staging_dir,
         ):
             directory.mkdir(parents=True, exist_ok=True)
 
-    def prepare_run_directory(self, run_id: int) -> dict[str, Path]:
-        run_root = self.config.base_dir / f"run_{run_id:08d}"
+    def run_root(self, run_id: int, created_at: datetime) -> Path:
+        """Run directories are sharded by creation date, then by a hash bucket, so no directory grows unbounded."""
+        bucket = hashlib.sha1(str(run_id).encode("ascii")).hexdigest()[:2]
+        return self.config.runs_dir / created_at.strftime("%Y/%m/%d") / bucket / f"run_{run_id:08d}"
+
+    def remove_run_directory(self, run_root: Path) -> None:
+        shutil.rmtree(run_root, ignore_errors=True)
+        # Drop shard directories left empty, up to the runs root
+        runs_dir = self.config.runs_dir.resolve()
+        parent = run_root.parent.resolve()
+        while parent != runs_dir and runs_dir in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+    def prepare_run_directory(self, run_id: int, created_at: datetime) -> dict[str, Path]:
+        run_root = self.run_root(run_id, created_at)
         uploads = run_root / "uploads"
         intermediates = run_root / "intermediates"
         outputs = run_root / "outputs"
@@ -36,12 +89,111 @@ class StorageManager:
             "outputs": outputs,
         }
 
-    def save_upload(self, file_bytes: bytes, original_name: str, run_dir: Path) -> Path:
+    @staticmethod
+    def _copy_stream(source: BinaryIO, target: BinaryIO, max_bytes: Optional[int]) -> tuple[int, str]:
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            target.write(chunk)
+        return size, digest.hexdigest()
+
+    def save_upload(
+        self,
+        source: UploadSource,
+        original_name: str,
+        run_dir: Path,
+        max_bytes: Optional[int] = None,
+    ) -> SavedUpload:
+        """Stream an upload to disk in chunks, hashing it and enforcing the size limit on the way."""
         timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
         sanitized_name = original_name.replace("/", "_")
         target = run_dir / f"{timestamp}_{sanitized_name}"
-        with open(target, "wb") as f:
-            f.write(file_bytes)
+        try:
+            with open(target, "wb") as f:
+                if isinstance(source, Path):
+                    with open(source, "rb") as reader:
+                        size, sha256 = self._copy_stream(reader, f, max_bytes)
+                elif isinstance(source, (bytes, bytearray)):
+                    size, sha256 = self._copy_stream(io.BytesIO(source), f, max_bytes)
+                else:
+                    size, sha256 = self._copy_stream(source, f, max_bytes)
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+        return SavedUpload(path=target, size=size, sha256=sha256)
+
+    def stage_upload(
+        self,
+        source: UploadSource,
+        original_name: str,
+        max_bytes: Optional[int] = None,
+    ) -> SavedUpload:
+        """Save an upload before its run exists, so no database transaction is open during the copy."""
+        return self.save_upload(source, original_name, self.config.staging_dir, max_bytes=max_bytes)
+
+    def adopt_upload(self, saved: SavedUpload, run_dir: Path) -> SavedUpload:
+        """Move a staged upload into its run directory (a rename, cheap enough inside a transaction)."""
+        target = run_dir / saved.path.name
+        saved.path.replace(target)
+        return SavedUpload(path=target, size=saved.size, sha256=saved.sha256)
+
+    def _get_writer(self) -> ThreadPoolExecutor:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(
+                    max_workers=max(1, self.config.artifact_writers),
+                    thread_name_prefix="ocr-artifacts",
+                )
+            return self._writer
+
+    @staticmethod
+    def _write_image(image: np.ndarray, target: Path) -> None:
+        suffix = target.suffix.lower()
+        if suffix == ".tif":
+            # Thresholded pages hold two values only: 1 bit per pixel with G4 compression
+            Image.fromarray(image).point(lambda value: 255 if value > 127 else 0, mode="1").save(
+                target, compression="group4"
+            )
+            return
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101] if suffix == ".webp" else []  # quality > 100 is lossless
+        if not cv2.imwrite(str(target), image, params):
+            raise RuntimeError(f"Cannot write image: {target}")
+
+    def _artifact_suffix(self, image: np.ndarray, binary: bool) -> str:
+        if self.config.artifact_format != "compact":
+            return ".png"
+        return ".tif" if binary and image.ndim == 2 else ".webp"
+
+    def _write_done(self, future: Future) -> None:
+        self._pending_writes.release()
+        exc = future.exception()
+        if exc is not None:
+            LOGGER.error("Failed to persist artifact: %s", exc)
+
+    def save_image(self, image: np.ndarray, target: Path, binary: bool = False) -> Optional[Path]:
+        """Queue an intermediate image for background persistence; returns None when disabled.
+
+        The suffix of ``target`` is replaced by the configured artifact format; ``binary`` marks
+        thresholded pages. Returns the path actually written. Blocks while the writers are too far
+        behind, so only a bounded number of pages wait in memory.
+        """
+        if not self.config.persist_artifacts:
+            return None
+        target = target.with_suffix(self._artifact_suffix(image, binary))
+        self._pending_writes.acquire()
+        try:
+            future = self._get_writer().submit(self._write_image, image, target)
+        except BaseException:
+            self._pending_writes.release()
+            raise
+        future.add_done_callback(self._write_done)
         return target
 
     def copy_files(self, files: Iterable[Path], target_dir: Path) -> list[Path]:
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+SAMPLERS_FILE = "samplers.json"
+
+_DATE_PATTERN = re.compile(r"(\d{1,2})\s*[/.\-]\s*(\d{1,2})\s*[/.\-]\s*(\d{4})")
+
+
+@dataclass
+class FieldTemplate:
+    name: str
+    # Normalized x, y, w, h relative to the located card
+    region: tuple[float, float, float, float]
+    regex: Optional[str] = None
+    whitelist: Optional[str] = None
+    normalize: Optional[str] = None
+
+    def clean(self, text: str) -> str:
+        value = unicodedata.normalize("NFC", " ".join(text.split()))
+        if self.normalize == "digits":
+            return re.sub(r"\D", "", value)
+        if self.normalize == "date":
+            match = _DATE_PATTERN.search(value)
+            if match:
+                day, month, year = match.groups()
+                return f"{int(day):02d}/{int(month):02d}/{year}"
+            return value
+        if self.normalize == "upper":
+            return value.upper()
+        return value
+
+    def is_valid(self, value: str) -> bool:
+        if not value:
+            return False
+        return re.fullmatch(self.regex, value) is not None if self.regex else True
+
+
+@dataclass
+class DocumentTemplate:
+    doc_type: str
+    version: str
+    fields: dict[str, FieldTemplate]
+    samplers: list[str] = field(default_factory=list)
+    aspect_ratio: float = 1.586
+    card_width: int = 1000
+
+    @classmethod
+    def from_dict(cls, data: dict) -> DocumentTemplate:
+        fields = {}
+        for name, spec in data.get("fields", {}).items():
+            region = spec["region"]
+            fields[name] = FieldTemplate(
+                name=name,
+                region=(float(region["x"]), float(region["y"]), float(region["w"]), float(region["h"])),
+                regex=spec.get("regex"),
+                whitelist=spec.get("whitelist"),
+                normalize=spec.get("normalize"),
+            )
+        card = data.get("card", {})
+        return cls(
+            doc_type=data["doc_type"],
+            version=str(data.get("version", "v1")),
+            fields=fields,
+            samplers=list(data.get("samplers", [])),
+            aspect_ratio=float(card.get("aspect_ratio", 1.586)),
+            card_width=int(card.get("width", 1000)),
+        )
+
+
+@dataclass
+class TemplateSelection:
+    template: DocumentTemplate
+    sampler: Optional[str]
+    fields: list[FieldTemplate]
+
+    def as_dict(self) -> dict:
+        return {
+            "doc_type": self.template.doc_type,
+            "version": self.template.version,
+            "sampler": self.sampler,
+            "fields": [spec.name for spec in self.fields],
+        }
+
+
+class TemplateRegistry:
+    """Field templates per document type and the sampler subsets shared with the .NET API."""
+
+    def __init__(self) -> None:
+        self.config = CONFIG.templates
+        self._templates: Optional[dict[str, DocumentTemplate]] = None
+        self._samplers: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, DocumentTemplate]:
+        with self._lock:
+            if self._templates is not None:
+                return self._templates
+            templates: dict[str, DocumentTemplate] = {}
+            directory = self.config.templates_dir
+            samplers_path = directory / SAMPLERS_FILE
+            if samplers_path.exists():
+                self._samplers = {
+                    code.upper(): list(fields)
+                    for code, fields in json.loads(samplers_path.read_text(encoding="utf-8")).items()
+                }
+            for path in sorted(directory.glob("*.json")) if directory.exists() else []:
+                if path.name == SAMPLERS_FILE:
+                    continue
+                try:
+                    template = DocumentTemplate.from_dict(json.loads(path.read_text(encoding="utf-8")))
+                except (KeyError, TypeError, ValueError):
+                    LOGGER.exception("Skipping invalid template %s", path)
+                    continue
+                templates[template.doc_type.upper()] = template
+            LOGGER.info(
+                "Loaded %d OCR templates, %d samplers from %s", len(templates), len(self._samplers), directory
+            )
+            self._templates = templates
+            return templates
+
+    def resolve(self, doc_type: Optional[str], sampler: Optional[str]) -> TemplateSelection:
+        """Pick the template for a doc type and/or sampler; raises ValueError when none applies."""
+        templates = self._load()
+        sampler_code = sampler.upper() if sampler else None
+        if sampler_code and sampler_code not in self._samplers:
+            raise ValueError(f"Unknown sampler: {sampler}")
+
+        if doc_type:
+            template = templates.get(doc_type.upper())
+            if template is None:
+                raise ValueError(f"No template for doc type: {doc_type}")
+        else:
+            matches = [tpl for tpl in templates.values() if sampler_code in {s.upper() for s in tpl.samplers}]
+            if not matches:
+                raise ValueError(f"No template serves sampler: {sampler}")
+            template = matches[0]
+
+        names = self._samplers[sampler_code] if sampler_code else list(template.fields)
+        missing = [name for name in names if name not in template.fields]
+        if missing:
+            LOGGER.warning("Template %s has no region for fields %s", template.doc_type, missing)
+        return TemplateSelection(
+            template=template,
+            sampler=sampler_code,
+            fields=[template.fields[name] for name in names if name in template.fields],
+        )
+
+
+TEMPLATES = TemplateRegistry()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .config import CONFIG
+from .converter import CONVERTER_POOL
+from .engines import PADDLE_ENGINE
+from .jobs import JOB_QUEUE
+from .parallel import PAGE_POOL
+from .retention import RETENTION
+
+LOGGER = logging.getLogger(__name__)
+
+
+def synthetic_page() -> np.ndarray:
+    image = np.full((160, 900, 3), 255, dtype=np.uint8)
+    cv2.putText(image, "OCR warmup 0123456789", (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (0, 0, 0), 3)
+    return image
+
+
+class Warmup:
+    """Preload models and start worker pools in the background; drives the /ready probe."""
+
+    def __init__(self) -> None:
+        self.config = CONFIG.warmup
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.timings: dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.state = "starting"
+        self._thread = threading.Thread(target=self._run, name="ocr-warmup", daemon=True)
+        self._thread.start()
+
+    def _timed(self, name: str, func, *args) -> None:
+        started = time.perf_counter()
+        func(*args)
+        self.timings[name] = round(time.perf_counter() - started, 3)
+
+    def _run(self) -> None:
+        error: Optional[str] = None
+        try:
+            if self.config.enabled:
+                self._timed("paddle_load", PADDLE_ENGINE.preload)
+                self._timed("engine_warmup", PAGE_POOL.start, synthetic_page())
+            else:
+                PAGE_POOL.start()
+            self._timed("converter_start", CONVERTER_POOL.start)
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.exception("Warmup failed")
+            error = str(exc)
+        finally:
+            # A failed warmup only keeps /ready at 503: recovered runs still drain and old artifacts still expire
+            JOB_QUEUE.start()
+            RETENTION.start()
+        if error is not None:
+            self.state = "failed"
+            self.error = error
+            return
+        self.state = "ready"
+        LOGGER.info("OCR service ready (%s)", self.timings)
+
+    def status(self) -> dict:
+        return {"status": self.state, "error": self.error, "timings": self.timings}
+
+
+WARMUP = Warmup()
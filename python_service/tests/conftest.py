@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# ocr_service reads its configuration from the environment at import time
+_DATA_DIR = Path(tempfile.mkdtemp(prefix="ocr-service-tests-"))
+os.environ.setdefault("OCR_STORAGE_ROOT", str(_DATA_DIR))
+os.environ.setdefault("OCR_DB_URL", f"sqlite:///{_DATA_DIR / 'ocr_history.sqlite'}")
+os.environ.setdefault("OCR_WARMUP", "false")
+os.environ.setdefault("OCR_RETENTION_ENABLED", "false")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "httpx", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from ocr_service.jobs import JOB_QUEUE  # noqa: E402
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    enqueued: list[int] = []
+    # Runs are only recorded: no worker threads, no OCR engines
+    monkeypatch.setattr(JOB_QUEUE, "start", lambda: None)
+    monkeypatch.setattr(JOB_QUEUE, "_enqueue", enqueued.extend)
+    test_client = TestClient(main.app)
+    test_client.enqueued = enqueued
+    return test_client
+
+
+def _zip_upload() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("scans/invoice.png", b"\x89PNG fake page one")
+        archive.writestr("scans/contract.pdf", b"%PDF-1.4 fake page two")
+        archive.writestr("scans/empty.jpg", b"")
+        archive.writestr("__MACOSX/scans/._invoice.png", b"resource fork")
+    return buffer.getvalue()
+
+
+def test_batch_expands_a_posted_zip(client):
+    response = client.post(
+        "/ocr/batch",
+        files=[("files", ("scans.zip", _zip_upload(), "application/zip"))],
+        data={"mode": "fast"},
+    )
+    assert response.status_code == 202, response.text
+    body = response.json()
+    assert len(body["run_ids"]) == 2
+    assert client.enqueued == body["run_ids"]
+
+    batch = client.get(f"/ocr/batch/{body['batch_id']}").json()
+    assert batch["file_count"] == 3
+    assert batch["counts"] == {"queued": 2, "failed": 1}
+    # Stored as <timestamp>_<member name> inside each run directory
+    stored = {
+        Path(run["original_file"]).name.split("_", 1)[1]: Path(run["original_file"])
+        for run in batch["runs"]
+        if run["status"] == "queued"
+    }
+    assert set(stored) == {"invoice.png", "contract.pdf"}
+    assert stored["invoice.png"].read_bytes() == b"\x89PNG fake page one"
+    assert stored["contract.pdf"].parent.name == "uploads"
+    failed = next(run for run in batch["runs"] if run["status"] == "failed")
+    assert failed["original_file"] == "empty.jpg"
+    assert failed["error_message"] == "Empty file provided"
+
+
+def test_batch_rejects_a_broken_zip(client):
+    response = client.post("/ocr/batch", files=[("files", ("scans.zip", b"not a zip", "application/zip"))])
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid archive")
+    assert client.enqueued == []
+
+
+def test_oversized_upload_is_refused_before_reading(client, monkeypatch):
+    monkeypatch.setattr(main.CONFIG, "allowed_file_size_mb", 0)
+    response = client.post("/ocr", files=[("file", ("big.png", b"x" * (128 * 1024), "image/png"))])
+    assert response.status_code == 413
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import io
+import tarfile
+import tempfile
+import zipfile
+
+import pytest
+
+# Importing ocr_service loads the whole service
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from ocr_service.archive import is_archive, iter_batch_files  # noqa: E402
+
+
+class ReadOnlyStream:
+    """A body stream without seek()/seekable(), like Starlette's spooled upload on Python 3.10."""
+
+    def __init__(self, data: bytes) -> None:
+        self._buffer = io.BytesIO(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._buffer.read(size)
+
+
+def _zip_bytes(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar_bytes(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+MEMBERS = {
+    "scans/page-1.png": b"first",
+    "scans/page-2.pdf": b"second",
+    "__MACOSX/scans/._page-1.png": b"resource fork",
+    ".hidden/notes.txt": b"skipped",
+}
+
+
+def _read_all(uploads) -> list[tuple[str, bytes]]:
+    return [(name, stream.read()) for name, stream in iter_batch_files(uploads)]
+
+
+@pytest.mark.parametrize(
+    "wrap",
+    [io.BytesIO, ReadOnlyStream, lambda data: _spooled(data)],
+    ids=["seekable", "not-seekable", "spooled"],
+)
+def test_zip_members_are_expanded(wrap):
+    source = wrap(_zip_bytes(MEMBERS))
+    assert _read_all([("documents.zip", source)]) == [("page-1.png", b"first"), ("page-2.pdf", b"second")]
+
+
+def test_tar_is_read_as_a_stream():
+    source = ReadOnlyStream(_tar_bytes(MEMBERS))
+    assert _read_all([("documents.tar.gz", source)]) == [("page-1.png", b"first"), ("page-2.pdf", b"second")]
+
+
+def test_plain_files_pass_through():
+    source = io.BytesIO(b"data")
+    assert list(iter_batch_files([("scan.jpg", source)])) == [("scan.jpg", source)]
+
+
+def test_invalid_zip_raises():
+    with pytest.raises(zipfile.BadZipFile):
+        _read_all([("broken.zip", ReadOnlyStream(b"not a zip"))])
+
+
+def test_archive_suffixes():
+    assert is_archive("A.ZIP") and is_archive("b.tgz") and is_archive("c.tar.xz")
+    assert not is_archive("scan.pdf")
+
+
+def _spooled(data: bytes) -> tempfile.SpooledTemporaryFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=16)
+    spooled.write(data)
+    spooled.seek(0)
+    return spooled
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("paddleocr")
+
+import numpy as np  # noqa: E402
+
+from ocr_service.cache import RESULT_CACHE  # noqa: E402
+from ocr_service.config import CONFIG  # noqa: E402
+from ocr_service.database import OcrCacheEntry, init_db, session_scope  # noqa: E402
+from ocr_service.engines import OcrEngineResult  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    ("section", "field", "value"),
+    [
+        ("preprocess", "steps", "threshold"),
+        ("preprocess", "orientation", "none"),
+        ("pipeline", "native_text", False),
+        ("pipeline", "native_min_chars", 500),
+        ("pipeline", "native_max_image_coverage", 0.9),
+        ("resolution", "target_text_px", 40.0),
+        ("tesseract", "psm", 4),
+        ("cascade", "min_confidence", 60.0),
+    ],
+)
+def test_document_key_changes_with_pipeline_settings(monkeypatch, section, field, value):
+    before = RESULT_CACHE.document_key("0" * 64, "auto")
+    monkeypatch.setattr(getattr(CONFIG, section), field, value)
+    assert RESULT_CACHE.document_key("0" * 64, "auto") != before
+
+
+def test_document_key_is_stable_per_content_and_mode():
+    key = RESULT_CACHE.document_key("0" * 64, "auto")
+    assert RESULT_CACHE.document_key("0" * 64, "auto") == key
+    assert RESULT_CACHE.document_key("0" * 64, "fast") != key
+    assert RESULT_CACHE.document_key("1" * 64, "auto") != key
+
+
+def _page_result(text: str) -> OcrEngineResult:
+    word_data = {"text": text.split(), "conf": [91.0] * len(text.split())}
+    return OcrEngineResult(text, 91.0, "tesseract", 1, {"word_data": word_data, "elapsed_ms": 3.0})
+
+
+def test_page_entries_are_stored_compressed_and_read_back(monkeypatch):
+    monkeypatch.setattr(CONFIG.cache, "enabled", True)
+    init_db()
+    keys = [RESULT_CACHE.page_key(np.full((8, 8), value, dtype=np.uint8), "fast") for value in (1, 2)]
+    RESULT_CACHE.put_pages([(keys[0], [_page_result("first page")]), (keys[1], [_page_result("second")])])
+
+    with session_scope() as session:
+        entry = session.get(OcrCacheEntry, keys[0])
+        assert entry.payload_json is None
+        assert entry.size_bytes == len(entry.payload)
+    cached = RESULT_CACHE.get_page(keys[0])
+    assert [result.text for result in cached] == ["first page"]
+    assert cached[0].extra["word_data"]["text"] == ["first", "page"]
+    assert RESULT_CACHE.get_page(keys[1])[0].text == "second"
+
+
+def test_hits_only_refresh_stale_last_used(monkeypatch):
+    monkeypatch.setattr(CONFIG.cache, "enabled", True)
+    init_db()
+    key = RESULT_CACHE.page_key(np.full((8, 8), 3, dtype=np.uint8), "fast")
+    RESULT_CACHE.put_pages([(key, [_page_result("page")])])
+    with session_scope() as session:
+        written = session.get(OcrCacheEntry, key).last_used_at
+
+    RESULT_CACHE.get_page(key)
+    with session_scope() as session:
+        entry = session.get(OcrCacheEntry, key)
+        assert entry.last_used_at == written
+        entry.last_used_at = datetime.utcnow() - timedelta(hours=2)
+
+    RESULT_CACHE.get_page(key)
+    with session_scope() as session:
+        assert session.get(OcrCacheEntry, key).last_used_at >= written
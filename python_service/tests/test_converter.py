@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import stat
+import threading
+import time
+
+import pytest
+
+# Importing ocr_service loads the whole service
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from ocr_service.config import CONFIG  # noqa: E402
+from ocr_service.converter import ConverterPool  # noqa: E402
+
+
+@pytest.fixture
+def hanging_unoserver(tmp_path, monkeypatch):
+    """A unoserver that never opens its port, so every worker boot runs into the startup timeout."""
+    script = tmp_path / "unoserver"
+    script.write_text("#!/bin/sh\nsleep 30\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(CONFIG.converter, "unoserver_bin", str(script))
+    monkeypatch.setattr(CONFIG.converter, "pool_size", 2)
+    monkeypatch.setattr(CONFIG.converter, "base_port", 39_101)
+    monkeypatch.setattr(CONFIG.converter, "startup_timeout_seconds", 2)
+    monkeypatch.setattr(CONFIG.converter, "profile_dir", tmp_path / "profiles")
+
+
+def test_metrics_do_not_wait_for_booting_workers(hanging_unoserver):
+    pool = ConverterPool()
+    starter = threading.Thread(target=pool.start)
+    starter.start()
+    try:
+        time.sleep(0.3)
+        started = time.perf_counter()
+        data = pool.metrics()
+        assert time.perf_counter() - started < 0.5
+        assert data["pool_size"] == 2
+        assert data["idle"] == 0
+    finally:
+        starter.join()
+        pool.shutdown()
+    assert pool.metrics()["idle"] == 2
+
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import zipfile
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from ocr_service.document_processor import DOCUMENT_PROCESSOR  # noqa: E402
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+
+
+def _docx(tmp_path, body: str):
+    path = tmp_path / "letter.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {W} {MC}><w:body>{body}</w:body></w:document>")
+    return path
+
+
+def _paragraph(text: str, inner: str = "") -> str:
+    return f"<w:p><w:r><w:t>{text}</w:t>{inner}</w:r></w:p>"
+
+
+def test_text_box_paragraphs_are_read_once(tmp_path):
+    box = "<w:txbxContent>" + _paragraph("Boxed note") + "</w:txbxContent>"
+    alternate = (
+        f"<mc:AlternateContent><mc:Choice>{box}</mc:Choice>"
+        f"<mc:Fallback>{box}</mc:Fallback></mc:AlternateContent>"
+    )
+    body = _paragraph("Dear customer,", alternate) + _paragraph("Regards")
+    text = DOCUMENT_PROCESSOR._extract_docx_text(_docx(tmp_path, body))
+    assert text == "Dear customer,\nBoxed note\nRegards"
+
+
+def test_table_cells_and_breaks(tmp_path):
+    cell = "<w:tc>{}</w:tc>"
+    row = cell.format(_paragraph("Amount")) + cell.format(_paragraph("100"))
+    table = f"<w:tbl><w:tr>{row}</w:tr></w:tbl>"
+    body = table + "<w:p><w:r><w:t>Line one</w:t><w:br/><w:t>Line</w:t><w:tab/><w:t>two</w:t></w:r></w:p>"
+    text = DOCUMENT_PROCESSOR._extract_docx_text(_docx(tmp_path, body))
+    assert text == "Amount\n100\nLine one\nLine\ttwo"
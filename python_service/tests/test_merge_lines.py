@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+import numpy as np  # noqa: E402
+
+from ocr_service.engines import MERGED_ENGINE, merge_line_results  # noqa: E402
+
+
+def _box(top: int) -> np.ndarray:
+    return np.array([[0, top], [200, top], [200, top + 20], [0, top + 20]], dtype=np.float32)
+
+
+BOXES = [_box(0), _box(30), _box(60), _box(90)]
+TESS_LINES = [("Hóa đơn", 91.0), ("Tong cong", 40.0), ("", None), ("", None)]
+PADDLE_LINES = [("Hoa don", 0.85), ("Tổng cộng", 0.97), ("Ngày 12/03", 0.9), ("", 0.0)]
+ELAPSED = {"tesseract": 12.0, "paddleocr": 30.0}
+
+
+@pytest.fixture()
+def results():
+    return merge_line_results(3, BOXES, TESS_LINES, PADDLE_LINES, ELAPSED)
+
+
+def test_returns_both_engines_and_the_merge(results):
+    assert [result.engine for result in results] == ["tesseract", "paddleocr", MERGED_ENGINE]
+    assert all(result.page_number == 3 for result in results)
+
+
+def test_merged_keeps_the_more_confident_reading_per_line(results):
+    merged = results[2]
+    assert merged.text.splitlines() == ["Hóa đơn", "Tổng cộng", "Ngày 12/03"]
+    assert [line["engine"] for line in merged.extra["lines"]] == ["tesseract", "paddleocr", "paddleocr"]
+    assert merged.extra["line_engines"] == {"tesseract": 1, "paddleocr": 2}
+    # Merged confidences are percentages whichever engine won
+    assert [line["confidence"] for line in merged.extra["lines"]] == pytest.approx([91.0, 97.0, 90.0])
+    assert merged.confidence == pytest.approx((91.0 + 97.0 + 90.0) / 3)
+    assert merged.score == pytest.approx(merged.confidence / 100)
+
+
+def test_lines_keep_their_boxes(results):
+    merged_boxes = [line["box"] for line in results[2].extra["lines"]]
+    assert merged_boxes == [BOXES[0].tolist(), BOXES[1].tolist(), BOXES[2].tolist()]
+    assert [line["box"] for line in results[0].extra["lines"]] == [box.tolist() for box in BOXES]
+
+
+def test_engine_results_skip_empty_lines(results):
+    tesseract, paddle, _ = results
+    assert tesseract.text == "Hóa đơn\nTong cong"
+    assert tesseract.confidence == pytest.approx((91.0 + 40.0) / 2)
+    assert tesseract.extra["elapsed_ms"] == 12.0
+    assert paddle.text == "Hoa don\nTổng cộng\nNgày 12/03"
+    assert paddle.confidence == pytest.approx((0.85 + 0.97 + 0.9) / 3)
+    assert paddle.extra["elapsed_ms"] == 30.0
+    assert len(paddle.extra["raw"][0]) == 4
+
+
+def test_no_lines():
+    tesseract, paddle, merged = merge_line_results(1, [], [], [], ELAPSED)
+    assert tesseract.text == paddle.text == merged.text == ""
+    assert merged.confidence is None
+    assert merged.extra["line_engines"] == {}
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from ocr_service.engines import TESSERACT_ENGINE  # noqa: E402
+from ocr_service.preprocess import PREPROCESSOR, _rotate  # noqa: E402
+
+LINES = [
+    "CONG TY TNHH Thuong Mai Dich Vu Binh Minh",
+    "HOA DON GIA TRI GIA TANG  So: 0012345",
+    "Ngay 12 thang 03 nam 2024",
+    "Khach hang: Tran Van Binh  MST: 0301234567",
+    "Dia chi: 45 Le Loi, Phuong Ben Nghe, Quan 1",
+    "Hinh thuc thanh toan: Chuyen khoan",
+    "Cong tien hang: 1.550.000  Thue GTGT 10%",
+    "Tong cong thanh toan: 1.705.000 VND",
+]
+# Turning the scan clockwise by the key is undone by the value
+TURNS = {
+    0: (None, 0),
+    90: (cv2.ROTATE_90_CLOCKWISE, 270),
+    180: (cv2.ROTATE_180, 180),
+    270: (cv2.ROTATE_90_COUNTERCLOCKWISE, 90),
+}
+
+
+def _page(dense: bool, height: int = 1400, width: int = 1000) -> np.ndarray:
+    page = np.full((height, width), 255, dtype=np.uint8)
+    if dense:
+        for index, y in enumerate(range(60, height - 40, 34)):
+            cv2.putText(page, LINES[index % len(LINES)], (50, y), cv2.FONT_HERSHEY_SIMPLEX, 0.75, 0, 2)
+    else:
+        # A few short, ragged lines in the upper part of the page
+        for index, y in enumerate(range(120, 520, 70)):
+            text = LINES[(index * 3) % len(LINES)][: 14 + 5 * index]
+            cv2.putText(page, text, (80 + 150 * (index % 2), y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    return page
+
+
+class FakeOsd:
+    """Stands in for Tesseract OSD: records calls and gives a fixed answer (None = failure)."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[int, int]] = []
+        self.answer = None
+
+    def __call__(self, image: np.ndarray):
+        self.calls.append(image.shape[:2])
+        return self.answer
+
+
+@pytest.fixture()
+def osd(monkeypatch) -> FakeOsd:
+    fake = FakeOsd()
+    monkeypatch.setattr(TESSERACT_ENGINE, "detect_orientation", fake)
+    monkeypatch.setattr(PREPROCESSOR.config, "orientation", "auto")
+    return fake
+
+
+@pytest.mark.parametrize("dense", [True, False], ids=["dense", "sparse"])
+@pytest.mark.parametrize("size", [(1400, 1000), (1000, 1400)], ids=["portrait", "landscape"])
+@pytest.mark.parametrize("turn", sorted(TURNS))
+def test_quarter_turns_are_undone(osd, dense, size, turn):
+    code, expected = TURNS[turn]
+    page = _page(dense, *size)
+    if code is not None:
+        page = cv2.rotate(page, code)
+    orientation = PREPROCESSOR.estimate_orientation(page)
+    assert orientation is not None
+    assert orientation.rotation == expected
+    assert orientation.method == "projection"
+    assert abs(orientation.skew) < 0.5
+    assert osd.calls == []
+
+
+@pytest.mark.parametrize("turn", [0, 90])
+@pytest.mark.parametrize("angle", [-4.0, 2.5])
+def test_residual_skew_is_measured_after_the_turn(osd, turn, angle):
+    code, expected = TURNS[turn]
+    page = _rotate(_page(True), angle, 255)
+    if code is not None:
+        page = cv2.rotate(page, code)
+    orientation = PREPROCESSOR.estimate_orientation(page)
+    assert orientation.rotation == expected
+    assert orientation.skew == pytest.approx(-angle, abs=0.3)
+
+
+def _speckles() -> np.ndarray:
+    # Ink without any line structure: neither profile dominates
+    page = np.full((1400, 1000), 255, dtype=np.uint8)
+    rng = np.random.default_rng(7)
+    for x, y in zip(rng.integers(20, 980, 3000), rng.integers(20, 1380, 3000)):
+        page[y : y + 4, x : x + 4] = 0
+    return page
+
+
+def test_unknown_direction_falls_back_to_osd(osd):
+    osd.answer = (90, 6.0)
+    orientation = PREPROCESSOR.estimate_orientation(_speckles())
+    assert orientation.rotation == 90
+    assert orientation.method == "osd"
+    assert len(osd.calls) == 1
+
+
+def test_unknown_direction_is_left_alone_without_osd(osd, monkeypatch):
+    assert PREPROCESSOR.estimate_orientation(_speckles()) is None
+    # Not confident enough
+    osd.answer = (180, 0.4)
+    assert PREPROCESSOR.estimate_orientation(_speckles()) is None
+    monkeypatch.setattr(PREPROCESSOR.config, "orientation", "projection")
+    osd.calls.clear()
+    assert PREPROCESSOR.estimate_orientation(_speckles()) is None
+    assert osd.calls == []
+
+
+def test_blank_page_has_no_orientation(osd):
+    assert PREPROCESSOR.estimate_orientation(np.full((1400, 1000), 255, dtype=np.uint8)) is None
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from ocr_service.resolution import DPI_STEP, RESOLUTION_POLICY  # noqa: E402
+
+
+def _page(width: int, height: int, font_scale: float, channels: int = 1) -> np.ndarray:
+    """White page filled with lines of text whose glyph height grows with ``font_scale``."""
+    page = np.full((height, width), 255, dtype=np.uint8)
+    line_height = int(45 * font_scale)
+    for y in range(line_height, height - 10, line_height):
+        cv2.putText(page, "Hoa don 0123 ABC xyz", (10, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, 2)
+    return cv2.cvtColor(page, cv2.COLOR_GRAY2BGR) if channels == 3 else page
+
+
+@pytest.fixture()
+def policy(monkeypatch):
+    config = RESOLUTION_POLICY.config
+    for name, value in {
+        "adaptive": True,
+        "default_dpi": 300,
+        "min_dpi": 50,
+        "max_dpi": 600,
+        "probe_dpi": 100,
+        "target_text_px": 24.0,
+        "max_megapixels": 100.0,
+        "min_image_side": 0,
+    }.items():
+        monkeypatch.setattr(config, name, value)
+    return RESOLUTION_POLICY
+
+
+def test_text_height_tracks_font_size(policy):
+    small = policy.estimate_text_height(_page(1400, 900, 1.0))
+    large = policy.estimate_text_height(_page(2800, 1800, 2.0))
+    assert small is not None and large is not None
+    assert 1.7 < large / small < 2.3
+
+
+def test_blank_page_has_no_text_height(policy):
+    assert policy.estimate_text_height(np.full((1100, 850), 255, dtype=np.uint8)) is None
+
+
+def test_pdf_dpi_without_probe_uses_default(policy, monkeypatch):
+    assert policy.pdf_dpi(None).dpi == 300
+    monkeypatch.setattr(policy.config, "adaptive", False)
+    assert policy.pdf_dpi(_page(850, 1100, 0.5)).dpi == 300
+
+
+def test_pdf_dpi_blank_page_uses_default(policy):
+    resolution = policy.pdf_dpi(np.full((1100, 850), 255, dtype=np.uint8))
+    assert resolution.dpi == 300
+    assert resolution.text_height_px is None
+
+
+def test_pdf_dpi_reaches_target_text_height(policy):
+    small_text = policy.pdf_dpi(_page(850, 1100, 0.5))
+    large_text = policy.pdf_dpi(_page(850, 1100, 1.5))
+    assert small_text.dpi > large_text.dpi
+    for resolution in (small_text, large_text):
+        assert resolution.dpi % DPI_STEP == 0
+        assert policy.config.min_dpi <= resolution.dpi <= policy.config.max_dpi
+        # Quantization to DPI_STEP moves the text height a little off target
+        assert resolution.text_height_px == pytest.approx(24.0, rel=0.2)
+
+
+def test_pdf_dpi_is_clamped(policy, monkeypatch):
+    monkeypatch.setattr(policy.config, "max_dpi", 200)
+    assert policy.pdf_dpi(_page(850, 1100, 0.4)).dpi == 200
+    monkeypatch.setattr(policy.config, "min_dpi", 150)
+    assert policy.pdf_dpi(_page(850, 1100, 3.0)).dpi == 150
+
+
+def test_pdf_dpi_caps_page_megapixels(policy, monkeypatch):
+    monkeypatch.setattr(policy.config, "max_megapixels", 1.0)
+    # A letter page (8.5 x 11 in) holds at most 1e6 px at ~103 DPI
+    assert policy.pdf_dpi(_page(850, 1100, 0.4)).dpi == 100
+
+
+def test_fit_image_keeps_small_images(policy):
+    image = _page(800, 600, 1.0, channels=3)
+    fitted, resolution = policy.fit_image(image)
+    assert fitted is image
+    assert resolution.scale == 1.0
+    assert resolution.original_size == (800, 600)
+
+
+def test_fit_image_never_upscales(policy):
+    image = _page(1200, 900, 0.4)
+    fitted, resolution = policy.fit_image(image)
+    assert fitted.shape == image.shape
+    assert resolution.scale == 1.0
+
+
+def test_fit_image_downscales_large_text(policy):
+    image = _page(3600, 2400, 3.0, channels=3)
+    fitted, resolution = policy.fit_image(image)
+    assert resolution.scale < 0.6
+    assert fitted.shape[1] == pytest.approx(3600 * resolution.scale, abs=2)
+    assert resolution.text_height_px == pytest.approx(24.0, rel=0.2)
+
+
+def test_fit_image_respects_min_side(policy, monkeypatch):
+    monkeypatch.setattr(policy.config, "min_image_side", 2400)
+    fitted, resolution = policy.fit_image(_page(3600, 2400, 3.0))
+    assert max(fitted.shape[:2]) == pytest.approx(2400, abs=2)
+    assert resolution.scale == pytest.approx(2 / 3, rel=0.01)
+
+
+def test_fit_image_caps_megapixels_without_adaptive(policy, monkeypatch):
+    monkeypatch.setattr(policy.config, "adaptive", False)
+    monkeypatch.setattr(policy.config, "max_megapixels", 4.0)
+    fitted, resolution = policy.fit_image(np.full((4000, 4000), 255, dtype=np.uint8))
+    assert fitted.shape == (2000, 2000)
+    assert resolution.scale == pytest.approx(0.5)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from ocr_service.database import OcrBatch, OcrResult, OcrRun, engine, session_scope  # noqa: E402
+from ocr_service.service import SERVICE  # noqa: E402
+from ocr_service.storage import STORAGE  # noqa: E402
+
+
+@pytest.fixture()
+def run_with_words() -> int:
+    with session_scope() as session:
+        run = OcrRun(original_file="scan.png", mode="fast", status="completed")
+        session.add(run)
+        session.flush()
+        for page in (1, 2, 3):
+            result = OcrResult(
+                run_id=run.id, engine="tesseract", mode="fast", page_number=page, text=f"page {page}"
+            )
+            result.set_extra({"elapsed_ms": 12.5, "word_data": {"text": ["page", str(page)]}})
+            session.add(result)
+        return run.id
+
+
+def _count_queries(func) -> tuple[object, int]:
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        return func(), len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("include", ["words", "extra,words", "results,text"])
+def test_get_run_loads_results_without_per_row_queries(run_with_words, include):
+    payload, queries = _count_queries(lambda: SERVICE.get_run(run_with_words, include=include))
+    # Run, results and (for words) one selectin query for all details
+    assert queries <= 3
+    assert len(payload["results"]) == 3
+    if "words" in include:
+        assert payload["results"][0]["extra"]["elapsed_ms"] == 12.5
+        assert payload["results"][0]["extra"]["word_data"] == {"text": ["page", "1"]}
+
+
+def test_cursor_round_trip():
+    run = OcrRun(id=42, original_file="scan.png", mode="fast", created_at=datetime(2026, 1, 2, 3, 4, 5, 678))
+    assert SERVICE._decode_cursor(SERVICE._encode_cursor(run)) == (run.created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm8tc2VwYXJhdG9y", "MjAyNi0wMS0wMnwxfDI="])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        SERVICE._decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_setup_failure_marks_the_run_failed(monkeypatch):
+    with session_scope() as session:
+        run = OcrRun(original_file="missing.png", mode="fast", status="processing")
+        session.add(run)
+        session.flush()
+        run_id = run.id
+
+    def broken(*_):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(STORAGE, "prepare_run_directory", broken)
+    events = SERVICE.stream_execute(run_id)
+    assert next(events)["event"] == "run"
+    with pytest.raises(HTTPException) as error:
+        next(events)
+    assert error.value.status_code == 500
+    with session_scope() as session:
+        run = session.get(OcrRun, run_id)
+        assert (run.status, run.error_message) == ("failed", "disk full")
+
+
+@pytest.mark.parametrize(
+    ("statuses", "expected"),
+    [
+        (["queued", "failed"], "queued"),
+        (["queued", "processing", "failed"], "processing"),
+        (["completed", "failed"], "completed_with_errors"),
+        (["failed", "failed"], "failed"),
+    ],
+)
+def test_batch_status(statuses, expected):
+    with session_scope() as session:
+        batch = OcrBatch(mode="fast", file_count=len(statuses))
+        session.add(batch)
+        session.flush()
+        for index, status in enumerate(statuses):
+            session.add(
+                OcrRun(original_file=f"doc_{index}.png", mode="fast", status=status, batch_id=batch.id)
+            )
+        batch_id = batch.id
+    assert SERVICE.get_batch(batch_id)["status"] == expected
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+import numpy as np  # noqa: E402
+
+from ocr_service.config import CONFIG  # noqa: E402
+from ocr_service.storage import StorageManager  # noqa: E402
+
+
+def test_save_image_blocks_once_the_writers_fall_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(CONFIG.storage, "persist_artifacts", True)
+    monkeypatch.setattr(CONFIG.storage, "artifact_writers", 1)
+    monkeypatch.setattr(CONFIG.pipeline, "prefetch_pages", 2)
+    storage = StorageManager()
+    release = threading.Event()
+    written: list[str] = []
+
+    def slow_write(image, target):
+        release.wait(5)
+        written.append(target.name)
+
+    monkeypatch.setattr(storage, "_write_image", slow_write)
+    page = np.zeros((4, 4), dtype=np.uint8)
+    queued: list[int] = []
+
+    def produce() -> None:
+        for index in range(5):
+            storage.save_image(page, tmp_path / f"page_{index}.png")
+            queued.append(index)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    producer.join(0.5)
+    # One write in progress plus two waiting: the fourth page is held back
+    assert queued == [0, 1, 2]
+    release.set()
+    producer.join(5)
+    assert queued == [0, 1, 2, 3, 4]
+    storage._writer.shutdown(wait=True)
+    assert len(written) == 5
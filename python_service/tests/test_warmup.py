@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pytest
+
+for _module in ("numpy", "cv2", "sqlalchemy", "fastapi", "pdf2image", "paddleocr"):
+    pytest.importorskip(_module)
+
+from ocr_service import warmup  # noqa: E402
+from ocr_service.jobs import JOB_QUEUE  # noqa: E402
+
+
+def test_failed_warmup_still_starts_the_queue(monkeypatch):
+    def broken() -> None:
+        raise RuntimeError("model files missing")
+
+    monkeypatch.setattr(warmup.PADDLE_ENGINE, "preload", broken)
+    monkeypatch.setattr(warmup.CONFIG.warmup, "enabled", True)
+    probe = warmup.Warmup()
+    probe._run()
+    assert probe.status()["status"] == "failed"
+    assert probe.error == "model files missing"
+    assert not probe.ready
+    assert JOB_QUEUE._workers